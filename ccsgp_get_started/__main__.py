@@ -1,11 +1,15 @@
-import string, logging, argparse, os
+import string, logging, argparse, os, sys, time, traceback, hashlib, json
+import inspect, glob
 from itertools import permutations, chain
+from multiprocessing import Pool, cpu_count
 from examples.gp_datdir import gp_datdir
 from examples.gp_lcltpt import gp_lcltpt
 from examples.gp_panel import gp_panel
 from examples.gp_stack import gp_stack
-from examples.gp_rdiff import gp_rdiff
-from examples.gp_ptspec import gp_ptspec
+from examples.gp_rdiff import gp_rdiff_absrel, norm_version as rdiff_norm_version
+from examples.gp_ptspec import gp_ptspec, norm_version
+from examples.utils import buildVersionBundle
+from examples import render
 #from examples.gp_rapp import gp_rapp # TODO: only produced for Nu Xu
 #from examples.gp_xfac import gp_xfac # TODO: produce dynamically in gp_rdiff
 
@@ -17,6 +21,10 @@ versions = [
 ltf = [True, False]
 ltf_perms = [zip(x,ltf) for x in permutations(ltf, len(ltf))]
 ltf_combs = list(chain(*ltf_perms))
+logDir = os.path.join('output', 'logs')
+specDir = os.path.join('output', 'specs')
+manifest_url = os.path.join('output', 'examples', 'build_manifest.json')
+fingerprint_env = [ 'CCSGP_TERMINALS' ] # env. variables affecting plot outputs
 
 def getBaseDir(plot):
     # TODO: de-hardcode
@@ -24,32 +32,213 @@ def getBaseDir(plot):
 
 def inBaseDirExists(plot): return os.path.exists(getBaseDir(plot))
 
-def inDirExists(plot, version):
-    return os.path.exists('%s/%s' % (getBaseDir(plot), version))
+def inDirExists(plot, version): # input dir or its version bundle
+    inDir = '%s/%s' % (getBaseDir(plot), version)
+    return os.path.exists(inDir) or os.path.exists(inDir + '.npz')
+
+def getInputs(plot, version = None, normVersion = None):
+    """input paths of a plot (version): dir and version bundle
+
+    incl. the input of the scale factors (see normalization) of normVersion
+    (default: the plot's version)
+    """
+    inDir = getBaseDir(plot)
+    normDir = '%s/%s' % (
+        getBaseDir('gp_stack'), normVersion or version or norm_version
+    )
+    normInputs = [ normDir, normDir + '.npz' ]
+    if version is None: return [ inDir ] + normInputs
+    inDir = '%s/%s' % (inDir, version)
+    return [ inDir, inDir + '.npz' ] + normInputs
+
+def getJobs():
+    """list of all plot jobs as (name, function, args, inputs)"""
+    jobs = []
+    #for l in list(string.ascii_uppercase): jobs.append(('gp_datdir_'+l, gp_datdir, (l, 4), []))
+    #jobs.append(('gp_lcltpt', gp_lcltpt, (), []))
+    for v in versions:
+        if inDirExists('gp_panel', v):
+            jobs.append((
+                'gp_panel_%s' % v, gp_panel, (v, None), getInputs('gp_panel', v)
+            ))
+        if inDirExists('gp_stack', v):
+            for med,fit in ltf_combs:
+                jobs.append((
+                    'gp_stack_%s_med%d_fit%d' % (v, med, fit),
+                    gp_stack, (v, None, med, fit), getInputs('gp_stack', v)
+                ))
+        if inDirExists('gp_rdiff', v):
+            for nomed,noxerr in ltf_combs: # absolute & relative in one pass
+                jobs.append((
+                    'gp_rdiff_%s_nomed%d_noxerr%d' % (v, nomed, noxerr),
+                    gp_rdiff_absrel, (v, nomed, noxerr, False),
+                    getInputs('gp_rdiff', v, rdiff_norm_version)
+                ))
+    if inBaseDirExists('gp_ptspec'):
+        jobs.append(('gp_ptspec', gp_ptspec, (), getInputs('gp_ptspec')))
+    return jobs
+
+def hashFiles(paths):
+    """sha1 over path & content of all files in paths (recursing into dirs)"""
+    sha1 = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, fn)
+                for root, dirs, fns in os.walk(path) for fn in fns
+            )
+        else:
+            files = [ path ] if os.path.exists(path) else []
+        for file_url in files:
+            sha1.update(file_url)
+            with open(file_url, 'rb') as f: sha1.update(f.read())
+    return sha1.hexdigest()
+
+def getSourceFiles(func):
+    """source files a plot function depends on
+
+    its module, the whole examples package (incl. utils, normalization,
+    render & fitting) and ccsgp
+    """
+    examplesDir = os.path.dirname(inspect.getsourcefile(buildVersionBundle))
+    ccsgpDir = os.path.join(os.path.dirname(examplesDir), 'ccsgp')
+    return sorted(set(
+        [ inspect.getsourcefile(func) ]
+        + glob.glob(os.path.join(examplesDir, '*.py'))
+        + glob.glob(os.path.join(ccsgpDir, '*.py'))
+    ))
+
+def getFingerprint(job, hashes = {}):
+    """fingerprint of a plot job
+
+    input files, parameters, source code & environment (fingerprint_env)
+    """
+    name, func, args, inputs = job
+    paths = [ tuple(inputs), tuple(getSourceFiles(func)) ]
+    for p in paths: # hash each input dir & module only once
+        if p not in hashes: hashes[p] = hashFiles(p)
+    return {
+        'inputs': hashes[paths[0]], 'params': repr(args),
+        'source': hashes[paths[1]],
+        'env': repr([ (k, os.environ.get(k)) for k in fingerprint_env ])
+    }
+
+def isUpToDate(entry, fingerprint):
+    """manifest entry of a job matches fingerprint and all outputs exist"""
+    return entry.get('fingerprint') == fingerprint and all(
+        os.path.exists(output) for output in entry.get('outputs', [])
+    )
+
+def loadManifest():
+    if not os.path.exists(manifest_url): return {}
+    with open(manifest_url, 'r') as f: return json.load(f)
+
+def saveManifest(manifest):
+    tmp_url = manifest_url + '.tmp'
+    with open(tmp_url, 'w') as f: json.dump(manifest, f, indent = 1, sort_keys = True)
+    os.rename(tmp_url, manifest_url)
+
+def runJob(job):
+    """run a single plot job w/ log & stdout redirected to its log file
+
+    in dry-run mode, the job's plot specs are saved to specDir/<name>.pkl
+
+    returns (name, success, duration, traceback, output files)
+    """
+    name, func, args = job[:3]
+    log_url = os.path.join(logDir, name + '.log')
+    logger, stdout = logging.getLogger(), sys.stdout
+    handlers, level = logger.handlers, logger.level
+    with open(log_url, 'w') as f:
+        handler = logging.StreamHandler(f)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.handlers = [ handler ]
+        logger.setLevel(min(level, logging.INFO))
+        sys.stdout = f
+        start, tb = time.time(), None
+        del render.plot_specs[:]
+        del render.plot_outputs[:]
+        try:
+            func(*args)
+            if render.dry_run: render.savePlotSpecs(
+                os.path.join(specDir, name + '.pkl'), render.plot_specs
+            )
+        except (Exception, SystemExit): # e.g. missing input (getWorkDirs)
+            tb = traceback.format_exc()
+        finally:
+            if tb is not None: f.write(tb)
+            sys.stdout = stdout
+            logger.handlers = handlers
+            logger.setLevel(level)
+    return name, tb is None, time.time() - start, tb, list(render.plot_outputs)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--log", help="show log output", action="store_true")
+    parser.add_argument(
+        "--bundle", help="pack input dirs into version bundles and exit",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of parallel plot jobs"
+    )
+    parser.add_argument(
+        "--force", help="rebuild all plots (ignore build manifest)",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--dry-run", help="only save plot specs to %s (no gnuplot)" % specDir,
+        action="store_true"
+    )
     args = parser.parse_args()
     loglevel = 'DEBUG' if args.log else 'WARNING'
     logging.basicConfig(
         format='%(message)s', level=getattr(logging, loglevel)
     )
-    #for l in list(string.ascii_uppercase): gp_datdir(l, 4)
-    #gp_lcltpt()
-    for v in versions:
-        if inDirExists('gp_panel', v):
-            logging.info('gp_panel: %s' % v)
-            gp_panel(v, None)
-        if inDirExists('gp_stack', v):
-            for med,fit in ltf_combs:
-                logging.info('gp_stack: %s %d %d' % (v, med, fit))
-                gp_stack(v, None, med, fit)
-        if inDirExists('gp_rdiff', v):
-            for nomed,noxerr in ltf_combs:
-                logging.info('gp_rdiff: %s %d %d' % (v, nomed, noxerr))
-                gp_rdiff(v, nomed, noxerr, False) # absolute
-                gp_rdiff(v, nomed, noxerr, True) # relative
-    if inBaseDirExists('gp_ptspec'):
-        logging.info('gp_ptspec')
-        gp_ptspec()
+    if args.bundle:
+        for plot in ['gp_panel', 'gp_stack', 'gp_rdiff', 'gp_sims']:
+            if not inBaseDirExists(plot): continue
+            for v in os.listdir(getBaseDir(plot)):
+                inDir = '%s/%s' % (getBaseDir(plot), v)
+                if os.path.isdir(inDir): print buildVersionBundle(inDir)
+        raise SystemExit
+    if not os.path.exists(logDir): os.makedirs(logDir)
+    if args.dry_run: render.dry_run = True
+    if render.dry_run and not os.path.exists(specDir): os.makedirs(specDir)
+    if not os.path.exists(os.path.dirname(manifest_url)):
+        os.makedirs(os.path.dirname(manifest_url))
+    # skip jobs whose fingerprint is unchanged since last successful build
+    # and whose outputs all exist
+    manifest = {} if args.force or render.dry_run else loadManifest()
+    jobs, fingerprints = [], {}
+    for job in getJobs():
+        fingerprints[job[0]] = getFingerprint(job)
+        if isUpToDate(manifest.get(job[0], {}), fingerprints[job[0]]):
+            logging.info('%s: up to date' % job[0])
+        else: jobs.append(job)
+    if args.jobs > 1:
+        if 'CCSGP_RENDER_WORKERS' not in os.environ: # share cpus among jobs
+            render.render_workers = max(cpu_count() // args.jobs, 1)
+        pool = Pool(args.jobs)
+        results = pool.imap_unordered(runJob, jobs)
+        pool.close()
+    else:
+        results = (runJob(job) for job in jobs)
+    summary, total = [], time.time()
+    for name, ok, duration, tb, outputs in results:
+        logging.info('%s: %s (%.1fs)' % (name, 'ok' if ok else 'FAILED', duration))
+        summary.append((name, ok, duration))
+        if render.dry_run: continue # nothing rendered
+        if ok: manifest[name] = {
+            'fingerprint': fingerprints[name], 'outputs': sorted(set(outputs))
+        }
+        else: manifest.pop(name, None)
+        saveManifest(manifest)
+    failed = [ name for name, ok, duration in summary if not ok ]
+    for name, ok, duration in sorted(summary, key = lambda s: -s[2]):
+        print '%7.1fs  %-6s  %s' % (duration, 'ok' if ok else 'FAILED', name)
+    print '%d/%d jobs done in %.1fs (%d up to date), logs in %s' % (
+        len(jobs) - len(failed), len(jobs), time.time() - total,
+        len(fingerprints) - len(jobs), logDir
+    )
+    if failed: sys.exit(1)
@@ -0,0 +1,153 @@
+"""batched weighted fits of linear and exponential models (numpy only)
+
+- all fits run on many independent data sets at once: x, y and errors are
+  arrays of shape (..., npoints), parameters are returned with shape
+  (..., 2) and covariances with shape (..., 2, 2)
+- data sets of different length are padded with NaN in x or y, padded
+  points are ignored; errors of all other points need to be finite and
+  positive (ValueError otherwise)
+- linear model y = m*x + b (params [m, b]) in closed form, errors in x
+  via effective variance dy^2 + m^2*dx^2 (iterated, see fitLinear)
+- exponential model y = exp(-c*x + d) (params [c, d]) via Levenberg-Marquardt
+  started from a linear fit of log(y)
+- covariances are absolute if errors are given (like curve_fit with
+  absolute_sigma=True), scaled by chi2/ndf otherwise
+- evalLinear/evalExp evaluate fitted models on grids (..., nx)
+"""
+import numpy as np
+
+max_iterations = 100 # max. number of iterations in iterative fits
+tolerance = 1e-10 # relative tolerance for convergence of iterative fits
+
+def _prepare(x, y, dy):
+  # broadcast inputs, weights = 1/dy^2, zero weight for padding (NaN in x/y)
+  x, y = [ np.asarray(v, dtype=float) for v in [x, y] ]
+  dy = np.ones(y.shape) if dy is None else np.asarray(dy, dtype=float)
+  x, y, dy = np.broadcast_arrays(x, y, dy)
+  valid = np.isfinite(x) & np.isfinite(y)
+  with np.errstate(invalid='ignore'):
+    bad = valid & ~(np.isfinite(dy) & (dy > 0))
+  if np.any(bad):
+    raise ValueError('%d data point(s) w/o finite & positive error' % bad.sum())
+  with np.errstate(divide='ignore'):
+    w = np.where(valid, 1./np.where(valid, dy, 1.)**2, 0.)
+  return np.where(valid, x, 0.), np.where(valid, y, 0.), w
+
+def _stack(arrays):
+  # stack arrays (...) along a new last axis (np.stack needs numpy >= 1.10)
+  return np.concatenate([ np.asarray(a)[...,None] for a in arrays ], axis=-1)
+
+def _matrices(a, b, c, d):
+  # 2x2 matrices [[a, b], [c, d]] (..., 2, 2) from arrays (...)
+  return np.concatenate(
+    [ _stack([a, b])[...,None,:], _stack([c, d])[...,None,:] ], axis=-2
+  )
+
+def _covariance(A, chi2, ndf, scaled):
+  # inverse of 2x2 matrices A (..., 2, 2), optionally scaled by chi2/ndf
+  det = A[...,0,0]*A[...,1,1] - A[...,0,1]*A[...,1,0]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    cov = _matrices(
+      A[...,1,1], -A[...,0,1], -A[...,1,0], A[...,0,0]
+    ) / det[...,None,None]
+    if scaled: cov *= (chi2 / np.maximum(ndf, 1))[...,None,None]
+  return cov
+
+def _linearSums(x, y, w):
+  # weighted means and centered sums of squares along last axis
+  with np.errstate(divide='ignore', invalid='ignore'):
+    S = w.sum(axis=-1)
+    xm, ym = (w*x).sum(axis=-1) / S, (w*y).sum(axis=-1) / S
+    dx, dy = x - xm[...,None], y - ym[...,None]
+    Sxx, Sxy = (w*dx**2).sum(axis=-1), (w*dx*dy).sum(axis=-1)
+    m = Sxy / Sxx
+  return m, ym - m*xm, S, xm, Sxx
+
+def fitLinear(x, y, dx = None, dy = None):
+  """weighted least-squares fits of y = m*x + b along last axis
+
+  - errors dx in x enter via effective variance dy^2 + m^2*dx^2, slopes
+    iterated to the exact least-squares solution (York et al., 2004, like
+    orthogonal distance regression)
+  - unweighted fits if neither dx nor dy are given
+
+  returns parameters [m, b] (..., 2), covariances (..., 2, 2) and chi2
+  """
+  x, y, w = _prepare(x, y, dy)
+  dy2 = np.where(w > 0, 1./np.where(w > 0, w, 1.), 0.)
+  m, b, S, xm, Sxx = _linearSums(x, y, w)
+  if dx is not None:
+    dx2 = np.asarray(dx, dtype=float)**2 + np.zeros(x.shape)
+    dx2 = np.where(np.isfinite(dx2), dx2, 0.)
+    for i in xrange(max_iterations): # York et al. (2004) slope iteration
+      with np.errstate(divide='ignore', invalid='ignore'):
+        weff = np.where(w > 0, 1./(dy2 + m[...,None]**2*dx2), 0.)
+        S = weff.sum(axis=-1)
+        U = x - ((weff*x).sum(axis=-1) / S)[...,None]
+        V = y - ((weff*y).sum(axis=-1) / S)[...,None]
+        beta = weff * (U*dy2 + m[...,None]*V*dx2)
+        mPrev, m = m, (weff*beta*V).sum(axis=-1) / (weff*beta*U).sum(axis=-1)
+      if np.all(~(np.abs(m - mPrev) > tolerance*np.abs(m))): break
+    w = np.where(w > 0, 1./(dy2 + m[...,None]**2*dx2), 0.)
+    mYork = m
+    m, b, S, xm, Sxx = _linearSums(x, y, w)
+    b, m = b + (m - mYork)*xm, mYork # intercept through weighted mean
+  chi2 = (w*(y - m[...,None]*x - b[...,None])**2).sum(axis=-1)
+  ndf = (w > 0).sum(axis=-1) - 2
+  # covariance of m and b from (S, Sx, Sxx) around weighted mean xm
+  with np.errstate(divide='ignore', invalid='ignore'):
+    A = _matrices(Sxx + S*xm**2, S*xm, S*xm, S)
+  cov = _covariance(A, chi2, ndf, dx is None and dy is None)
+  return _stack([m, b]), cov, chi2
+
+def evalLinear(params, x):
+  """evaluate y = m*x + b for parameters (..., 2) at x (broadcast)"""
+  params = np.asarray(params, dtype=float)
+  return params[...,0,None]*np.asarray(x, dtype=float) + params[...,1,None]
+
+def evalExp(params, x):
+  """evaluate y = exp(-c*x + d) for parameters (..., 2) at x (broadcast)"""
+  params = np.asarray(params, dtype=float)
+  return np.exp(-params[...,0,None]*np.asarray(x, dtype=float) + params[...,1,None])
+
+def fitExp(x, y, dy = None, p0 = None):
+  """weighted least-squares fits of y = exp(-c*x + d) along last axis
+
+  - Levenberg-Marquardt with damping per data set
+  - start parameters p0 [c, d] (..., 2) default to a linear fit of log(y)
+    on points with y > 0
+
+  returns parameters [c, d] (..., 2), covariances (..., 2, 2) and chi2
+  """
+  x, y, w = _prepare(x, y, dy)
+  if p0 is None:
+    with np.errstate(divide='ignore', invalid='ignore'):
+      logy = np.where((w > 0) & (y > 0), np.log(np.where(y > 0, y, 1.)), np.nan)
+    p0 = fitLinear(x, logy)[0] * [-1., 1.]
+    p0 = np.where(np.isfinite(p0), p0, 1.)
+  p = np.asarray(p0, dtype=float) + np.zeros(y.shape[:-1] + (2,))
+  def chi2JacobianSums(p):
+    f = evalExp(p, x)
+    r, J = y - f, _stack([-x*f, f]) # J: df/dc, df/dd
+    A = np.einsum('...ni,...n,...nj->...ij', J, w, J)
+    g = np.einsum('...ni,...n,...n->...i', J, w, r)
+    return (w*r**2).sum(axis=-1), A, g
+  chi2, A, g = chi2JacobianSums(p)
+  lam, done = np.full(chi2.shape, 1e-3), np.zeros(chi2.shape, dtype=bool)
+  for i in xrange(max_iterations):
+    # damped normal equations (A + lam*diag(A)) delta = g
+    D = A * (1. + lam[...,None,None]*np.eye(2))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+      delta = np.einsum('...ij,...j->...i', _covariance(D, None, None, False), g)
+      pNew = p + np.where(np.isfinite(delta), delta, 0.)
+      chi2New, ANew, gNew = chi2JacobianSums(pNew)
+    better = np.isfinite(chi2New) & (chi2New <= chi2)
+    done |= ~(np.abs(chi2 - chi2New) > tolerance*chi2) & better
+    p = np.where(better[...,None], pNew, p)
+    A = np.where(better[...,None,None], ANew, A)
+    g = np.where(better[...,None], gNew, g)
+    lam = np.where(better, lam*0.1, lam*10.)
+    chi2 = np.where(better, chi2New, chi2)
+    if np.all(done | (lam > 1e10)): break
+  ndf = (w > 0).sum(axis=-1) - 2
+  return p, _covariance(A, chi2, ndf, dy is None), chi2
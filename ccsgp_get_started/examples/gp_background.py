@@ -1,7 +1,7 @@
 import logging, argparse, re, os, glob
 import numpy as np
-from .utils import getWorkDirs, getEnergy4Key
-from ..ccsgp.ccsgp import make_plot, make_panel
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key
+from .render import make_plot, make_panel
 from ..ccsgp.config import default_colors
 from ..ccsgp.utils import colorscale
 from collections import OrderedDict
@@ -41,7 +41,7 @@ def gp_background():
                 inDir, 'rawdata', energy, 'pt-differential', '%s_*.dat' % dtype
             )))):
                 file_url = os.path.realpath(os.path.join(inDir, infile))
-                data_import = np.loadtxt(open(file_url, 'rb'))
+                data_import = loadDatFile(file_url)
                 if REBIN is None: REBIN = int(data_import[-1][2]*2*1000) # MeV
                 data_import[:,4] = data_import[:,3]
                 data_import[:,(2,3)] = 0
@@ -93,7 +93,7 @@ def gp_background():
     for infile in os.listdir(os.path.join(inDir, 'sn')):
         energy = re.compile('\d+').search(infile).group()
         file_url = os.path.join(inDir, 'sn', infile)
-        data_import = np.loadtxt(open(file_url, 'rb'))
+        data_import = loadDatFile(file_url)
         mask = (data_import[:,0] > 0.3) & (data_import[:,0] < 0.75)
         data_import = data_import[mask]
         weights = 1./data_import[:,3]
@@ -139,7 +139,7 @@ def gp_rebin():
             )))):
                 if sgn_idx == 1 and fnmatch(dtype, '*sigRb*'): continue
                 file_url = os.path.realpath(os.path.join(inDir, infile))
-                data_import = np.loadtxt(open(file_url, 'rb'))
+                data_import = loadDatFile(file_url)
                 data_import = data_import[data_import[:,0]>0.1]
                 for i in [1,3,4]:
                     data_import[:,i] /= NEVTS[energy]
@@ -176,7 +176,7 @@ def gp_peaks():
             data[key] = [[], [], []]
             file_url = os.path.realpath(os.path.join(
                 inDir, 'rawdata', energy, 'sigRbPtTotRaw.dat'))
-            data_import = np.loadtxt(open(file_url, 'rb'))
+            data_import = loadDatFile(file_url)
             #mask = (data_import[:,0] > mee_range[0]) & (data_import[:,0] < mee_range[1])
             #data_import = data_import[mask]
             for i in [1,3,4]: data_import[:,i] /= NEVTS[energy]
@@ -206,7 +206,7 @@ def gp_norm(infile):
         file_url = os.path.realpath(os.path.join(
             inDir, 'rawdata', energy, 'pt-integrated', infile+'.dat'
         ))
-        data_import = np.loadtxt(open(file_url, 'rb'))
+        data_import = loadDatFile(file_url)
         data_import[:,1] += eidx * 0.2
         data_import[:,4] = data_import[:,3]
         data_import[:,(2,3)] = 0
@@ -252,7 +252,7 @@ def gp_acc():
         for idx,infile in enumerate(glob.glob(os.path.realpath(os.path.join(
             inDir, 'rawdata', energy, 'pt-differential', 'acPt_*.dat'
         )))):
-            data_import = np.loadtxt(open(infile, 'rb'))
+            data_import = loadDatFile(infile)
             data_import[:,1] += idx * 0.2
             data_import[:,4] = data_import[:,3]
             data_import[:,(2,3)] = 0
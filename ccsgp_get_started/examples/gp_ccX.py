@@ -1,21 +1,12 @@
 import os, argparse, logging
-from .utils import getWorkDirs, getEnergy4Key, particleLabel4Key
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key, particleLabel4Key
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_plot, make_panel
+from .render import make_plot, make_panel
 from ..ccsgp.config import default_colors
-from scipy.optimize import curve_fit
+from .fitting import fitLinear, fitExp, evalLinear, evalExp
 import numpy as np
 from uncertainties import ufloat
 
-def linear(x, a, b):
-    return a*x+b
-
-def exp(x, c, d):
-    return np.exp(-c*x+d)
-
-def fitfunc(x, a, b, c, d):
-    return linear(x, a, b) - exp(x, c, d)
-
 def gp_ccX():
     """fit experimental data"""
     inDir, outDir = getWorkDirs()
@@ -23,7 +14,7 @@ def gp_ccX():
     for infile in os.listdir(inDir):
         # get key and import data
         key = os.path.splitext(infile)[0].replace('_', '/')
-        data_import = np.loadtxt(open(os.path.join(inDir, infile), 'rb'))
+        data_import = loadDatFile(os.path.join(inDir, infile))
         # convert to log10 vs log10 plot, z=log10(y) => dz=0.434*dy/y
         data_import[:,3] = 0.434*(data_import[:,3]/data_import[:,1])
         data_import[:,(0,1)] = np.log10(data_import[:,(0,1)])
@@ -31,37 +22,34 @@ def gp_ccX():
         # fill dictionary
         data[key] = data_import
         alldata = data[key] if alldata is None else np.vstack((alldata, data[key]))
-    # fit linear part first
+    # fit linear part first: y = ax+b
     lindata = alldata[alldata[:,0]>2.5]
-    m = (lindata[-1,1]-lindata[0,1])/(lindata[-1,0]-lindata[0,0])
-    t = lindata[0,1] - m * lindata[0,0]
-    popt1, pcov = curve_fit(
-        linear, lindata[:,0], lindata[:,1], p0=[m, t],
-        sigma=lindata[:,3], absolute_sigma=True
-    )
-    # fit full range
-    popt2, pcov = curve_fit(
-        lambda x, c, d: fitfunc(x, popt1[0], popt1[1], c, d),
-        alldata[:,0], alldata[:,1], sigma=alldata[:,3], absolute_sigma=True,
-    )
+    popt1 = fitLinear(lindata[:,0], lindata[:,1], dy=lindata[:,3])[0]
+    # fit full range with fixed linear part: ax+b - y = e^{-cx+d}
+    popt2 = fitExp(
+        alldata[:,0], evalLinear(popt1, alldata[:,0]) - alldata[:,1],
+        dy=alldata[:,3]
+    )[0]
     popt = np.hstack((popt1, popt2))
-    model = lambda x: fitfunc(x, *popt)
+    model = lambda x: evalLinear(popt1, x) - evalExp(popt2, x)
     # calculate mean standard deviation of data from parameterization
-    yfit = np.array([model(x) for x in alldata[:,0]])
+    yfit = model(alldata[:,0])
     stddev = 1.5*np.sqrt( # multiple of "sigma"
         np.average((alldata[:,1]-yfit)**2, weights=1./alldata[:,3])
     )
     print 'stddev = %.2g' % stddev
-    errorband = np.array([[x, model(x), 0, 0, stddev] for x in np.linspace(1,4)])
+    xfit = np.linspace(1,4)
+    zeros = np.zeros(len(xfit))
+    errorband = np.column_stack((xfit, model(xfit), zeros, zeros, zeros+stddev))
     # make plot
-    fitdata = np.array([[x, model(x), 0, 0, 0] for x in np.linspace(1,4)])
+    fitdata = np.column_stack((xfit, model(xfit), zeros, zeros, zeros))
     par_names = ['a', 'b', 'c', 'd']
     energies = [19.6, 27, 39, 62.4, 200]
     labels = dict(
         ('%s = %.3g' % (par_name, popt[i]), [3.3, 3-i*0.2, True])
         for i,par_name in enumerate(par_names)
     )
-    ccX_vals = [10**model(np.log10(energy)) for energy in energies]
+    ccX_vals = 10**model(np.log10(energies))
     ccX = [' '.join([
         '%g GeV:' % energy,
         '({})'.format(ufloat(ccX_vals[i], stddev/0.434*ccX_vals[i])),
@@ -1,7 +1,7 @@
 import os, argparse, logging, math
-from .utils import getWorkDirs, getEnergy4Key, particleLabel4Key
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key, particleLabel4Key
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_plot, make_panel
+from .render import make_plot, make_panel
 from ..ccsgp.config import default_colors
 import numpy as np
 from itertools import groupby
@@ -24,7 +24,7 @@ def gp_syserr():
                 ptstr = 'Pt%.2f' % pt
                 fname = particle + charge + ptstr + '.dat'
                 data[subkey][0].append(
-                    np.loadtxt(open(os.path.join(inDir, fname), 'rb'))
+                    loadDatFile(os.path.join(inDir, fname))
                 )
                 data[subkey][0][-1][:,0] += factor*shift + factorPt*shiftPt # shift data for visibility
                 data[subkey][1].append(
@@ -64,7 +64,7 @@ def gp_tpc_select_eff():
     inDir, outDir = getWorkDirs()
     for energy in ['19', '27', '39', '62']:
         infile = os.path.join(inDir, 'tpc_select_eff', 'electrons_%sGeV.dat' % energy)
-        data_import = np.loadtxt(open(infile, 'rb'))
+        data_import = loadDatFile(infile)
         nrows = len(data_import)
         data_import[:,1:] *= 100. # convert to %
         #if energy != '19': data_import[:,2:] = 0
@@ -103,7 +103,7 @@ def gp_tof_match():
         d = OrderedDict()
         for ip,particle in enumerate(['pi', 'e']):
             infile = os.path.join(inDir, 'tof_match', '%sminus_39_%s.dat' % (particle, suffix))
-            data_import = np.loadtxt(open(infile, 'rb'))
+            data_import = loadDatFile(infile)
             data_import[:,3:] *= 100. # convert to %
             data_import = data_import[data_import[:,0]<2.]
             if particle == 'pi': data_import[:,4] = 0
@@ -136,7 +136,7 @@ def gp_tof_match():
 
 def gp_tof_match_extra():
     inDir, outDir = getWorkDirs()
-    data_import = np.loadtxt(open(os.path.join(inDir, 'tof_match', 'extra.dat'), 'rb'))
+    data_import = loadDatFile(os.path.join(inDir, 'tof_match', 'extra.dat'))
     energies = ['19.6 GeV', '27 GeV', '39 GeV', '62.4 GeV']
     particles = ['e^{-}', 'e^{+}']
     columns = ['{/Symbol \104}{/Symbol \145}', 'F', '{/Symbol \143}^{2}']
@@ -191,7 +191,7 @@ def gp_tof_match_extra():
         layout = '3x2', size = '5in,8in',
         key = ['nobox', 'at graph 0.99,0.8'],
         gpcalls = ['bars small', 'ytics 0.2'],
-        key_subplot_id = 2
+        key_subplot_id = 2, decimate = 500
     )
 
 def gp_total():
@@ -203,8 +203,8 @@ def gp_total():
         ekey = ' '.join([getEnergy4Key(energy), 'GeV'])
         data[ekey] = [[], [], []]
         for p,particle in enumerate(particles):
-            data_import = np.loadtxt(
-                open(os.path.join(inDir, 'total', particle+energy+'.dat'), 'rb')
+            data_import = loadDatFile(
+                os.path.join(inDir, 'total', particle+energy+'.dat')
             )
             data_import[:,3:] *= 100.
             if p == 1: data_import[:,0] *= 1.03
@@ -241,8 +241,8 @@ def gp_pair():
     for energy in energies:
         ekey = ' '.join([getEnergy4Key(energy), 'GeV'])
         if ekey != '19.6 GeV': data[ekey] = [[], [], []]
-        data_import = np.loadtxt(
-            open(os.path.join(inDir, 'pair', 'pair'+energy+'.dat'), 'rb')
+        data_import = loadDatFile(
+            os.path.join(inDir, 'pair', 'pair'+energy+'.dat')
         )
         centers = np.array(sorted(set(data_import[:,1])))
         edges = [0.]
@@ -274,7 +274,7 @@ def gp_pair():
 def gp_phiv():
     inDir, outDir = getWorkDirs()
     infile = os.path.join(inDir, 'phiVeff.dat')
-    data_import = np.loadtxt(open(infile, 'rb'))
+    data_import = loadDatFile(infile)
     nrows = len(data_import)
     data_import[:,1] *= 100. # convert to %
     data = np.c_[ data_import, np.zeros(nrows), np.zeros(nrows), np.zeros(nrows) ]
@@ -1,6 +1,6 @@
 import os
 import numpy as np
-from ..ccsgp.ccsgp import make_plot
+from .render import make_plot
 from .utils import getWorkDirs
 from ..ccsgp.config import default_colors
 
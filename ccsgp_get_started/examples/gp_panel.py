@@ -1,8 +1,8 @@
-import logging, argparse, os, sys, re
-import numpy as np
+import logging, argparse, os, sys
 from collections import OrderedDict
-from .utils import getWorkDirs, getEnergy4Key
-from ..ccsgp.ccsgp import make_panel
+from .utils import getWorkDirs, VersionInput, getEnergy4Key
+from .render import make_panel
+from .normalization import getScaleFactors, scaled_versions
 from ..ccsgp.utils import getOpts
 from ..ccsgp.config import default_colors
 from fnmatch import fnmatch
@@ -16,30 +16,21 @@ def gp_panel(version, skip):
   :param version: plot version / input subdir name
   :type version: str
   """
-  scale = { # QM14 (19 GeV skip later, factor here only informational)
-    '19': 1.0340571932983775, '200': 1.0, '39': 0.7776679085382481,
-    '27': 0.6412140408244136, '62': 0.9174700031778402
-  } if version == 'QM14' else {
-      '19': 1.3410566491548412, '200': 1.1051002240771077,
-      '39': 1.2719203877292842, '27': 1.350873678084769,
-      '62': 1.2664666321635087
-  }
+  # QM14: 19 GeV skipped later, factor only informational
+  scale = getScaleFactors(version) if version in scaled_versions else {}
   inDir, outDir = getWorkDirs()
   inDir = os.path.join(inDir, version)
   data = {}
   vacRhoTitle = '{/Symbol \162}/{/Symbol \167} VacSF+FB'
-  for infile in os.listdir(inDir):
-    if infile == "cocktail_contribs": continue
+  vin = VersionInput(inDir)
+  for infile, energy, data_type in vin.entries():
     if infile == 'mediumDmOnly200.dat': continue
-    energy = re.compile('\d+').search(infile).group()
     if skip is not None and energy == skip: continue
-    data_type = re.sub('%s\.dat' % energy, '', infile)
-    file_url = os.path.join(inDir, infile)
-    data_import = np.loadtxt(open(file_url, 'rb'))
+    data_import = vin.load(infile)
     if data_type != 'data' and (
         (version == 'QM14' and energy != '19') or version == 'LatestPatrickJieYi'
     ):
-       data_import[:,(1,3,4)] /= scale[energy]
+       data_import[:,(1,3,4)] /= scale[energy].nominal_value
     if data_type == 'cocktail': data_import[:,2:] = 0.
     elif fnmatch(data_type, '*medium*') or data_type == 'vacRho':
        data_import = data_import[data_import[:,0] < 0.9] \
@@ -1,8 +1,9 @@
 import logging, argparse, os, sys, re
 import numpy as np
 from collections import OrderedDict
-from .utils import getWorkDirs, getEnergy4Key
-from ..ccsgp.ccsgp import make_panel, make_plot
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key
+from .render import make_panel, make_plot
+from .normalization import getScaleFactors
 from ..ccsgp.utils import getOpts
 from ..ccsgp.config import default_colors
 from decimal import Decimal
@@ -10,6 +11,8 @@ import uncertainties.umath as umath
 import uncertainties.unumpy as unp
 from fnmatch import fnmatch
 
+norm_version = 'LatestPatrickJieYi' # data version for scale factors
+
 def getMeeLabel(s):
   if s == 'pi0': return '{/Symbol \160}^0'
   if s == 'omega': return '{/Symbol \167}'
@@ -40,10 +43,7 @@ def gp_ptspec():
   inDir, outDir = getWorkDirs()
   data, data_avpt, dpt_dict = {}, {}, {}
   yvals, yvalsPt = [], []
-  scale = {
-      '19': 1.3410566491548412, '200': 1.0, '39': 1.2719203877292842,
-      '27': 1.350873678084769, '62': 1.2664666321635087
-  }
+  scale = getScaleFactors(norm_version)
   lmr_label = None
   for filename in os.listdir(inDir):
     # import data
@@ -58,7 +58,7 @@ def gp_ptspec():
     if energy == '200': continue
     if mee_name not in mee_keys: continue
     mee_dict[mee_name] = mee_range
-    data[filebase] = np.loadtxt(open(file_url, 'rb'))
+    data[filebase] = loadDatFile(file_url)
     if data_type == 'data':
         #print data[filebase]
         data[filebase] = data[filebase][:-1] # skip mT<0.4 point
@@ -86,7 +86,7 @@ def gp_ptspec():
     yvalsPt.append(avpt.nominal_value)
     # now adjust data for panel plot and append to yvals
     if data_type != 'data':
-      data[filebase][:,(1,3,4)] /= scale[energy]
+      data[filebase][:,(1,3,4)] /= scale[energy].nominal_value
     data[filebase][:,(1,3,4)] *= float(yscale[energy])
     if data_type == 'cocktail' or fnmatch(data_type, '*medium*'):
         data[filebase][:,2:] = 0.
@@ -1,7 +1,7 @@
 import os, argparse, logging, math, glob
-from .utils import getWorkDirs, getEnergy4Key, particleLabel4Key
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key, particleLabel4Key
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_panel
+from .render import make_panel
 from ..ccsgp.config import default_colors
 import numpy as np
 
@@ -19,14 +19,14 @@ def gp_purity():
         data[ekey] = [[], [], []]
         for pidx,particle in enumerate(particles):
             infile = os.path.join(inDir, '{}_{}_sampfr.dat'.format(particle, energy))
-            data_import = np.loadtxt(open(infile,'r'))
+            data_import = loadDatFile(infile)
             for x in sampfr:
                 sampfr[x].append(sum(data_import[data_import[:,0]<x][:,1]))
             for didx,dtype in enumerate(dtypes):
                 infile = os.path.join(inDir, '{}_{}_{}.dat'.format(
                     particle, energy, dtype
                 ))
-                data_import = np.loadtxt(open(infile,'r'))
+                data_import = loadDatFile(infile)
                 data_import[:,2] = 0
                 #data_import = data_import[data_import[:,1]>0.001]
                 propsstr = 'with linespoints lt {} lw 4 pt 18 lc {} ps 1.2' if didx == 0 \
@@ -77,7 +77,7 @@ def gp_nsigmael():
                 infile = os.path.join(inDir, '{}_{}_{}_{}.dat'.format(
                     particle, energy, dtype, r
                 ))
-                data_import = np.loadtxt(open(infile,'r'))
+                data_import = loadDatFile(infile)
                 if len(data_import) < 1: data_import = fakept
                 data_import[:,2] = 0
                 props = 'lw 4 pt {} lc {} ps 1.4'.format(70+pidx, default_colors[-1]) \
@@ -1,8 +1,8 @@
 import logging, argparse, os, re
 import numpy as np
 from ..ccsgp.config import default_colors
-from ..ccsgp.ccsgp import make_plot, make_panel
-from .utils import getWorkDirs, getMassRangesSums, getEnergy4Key
+from .render import make_plot, make_panel
+from .utils import getWorkDirs, loadDatFile, getMassRangesSums, getEnergy4Key
 from math import pi, log
 from collections import OrderedDict
 
@@ -13,7 +13,7 @@ def gp_rapp():
   yields = {}
   for infile in os.listdir(inDir):
     energy = re.compile('\d+').search(infile).group()
-    medium = np.loadtxt(open(os.path.join(inDir, infile), 'rb'))
+    medium = loadDatFile(os.path.join(inDir, infile))
     getMassRangesSums(energy, medium, yields)
   data = dict( # sort by energy
     (k, np.array(sorted(v)))
@@ -70,7 +70,7 @@ def calc_pQCD(nf): # nf = 2,3
 def gp_ee_hadrons_xsec():
   inDir, outDir = getWorkDirs()
   infile = os.path.join(inDir, 'ee_hadrons_xsec.dat')
-  data = np.loadtxt(open(infile, 'rb'))
+  data = loadDatFile(infile)
   data[:,-1] = 0 # ignore systematic uncertainties
   pQCD = calc_pQCD(2)
   pQCD = np.vstack((pQCD, calc_pQCD(3)))
@@ -116,7 +116,7 @@ def gp_rapp_overview_panel():
       dpt_dict[subkeys[0]][2].append(title)
   for i,modeltype in enumerate(['MedOnly', 'QgpOnly']):
       infile = os.path.join(inDir, 'medium'+modeltype+'19.dat')
-      data = np.loadtxt(open(infile, 'rb'))
+      data = loadDatFile(infile)
       data[:,2:] = 0
       dpt_dict[subkeys[0]][0].append(data)
       dpt_dict[subkeys[0]][1].append(
@@ -125,7 +125,7 @@ def gp_rapp_overview_panel():
       dpt_dict[subkeys[0]][2].append('')
   for i,energy in enumerate(energies):
       infile = os.path.join(inDir, 'medium'+energy+'.dat')
-      data = np.loadtxt(open(infile, 'rb'))
+      data = loadDatFile(infile)
       data[:,2:] = 0
       dpt_dict[subkeys[0]][0].append(data)
       dpt_dict[subkeys[0]][1].append('with lines lt 1 lc %s lw 5' % default_colors[i])
@@ -135,7 +135,7 @@ def gp_rapp_overview_panel():
       '../../gp_panel/input/LatestPatrickJieYi/cocktail27.dat',
       'vacRho27.dat', 'medium27.dat'
   ]):
-      data = np.loadtxt(open(os.path.join(inDir, infile), 'rb'))
+      data = loadDatFile(os.path.join(inDir, infile))
       data[:,(2,3)] = 0
       if i != 2: data[:,4] = 0
       dpt_dict[subkeys[1]][0].append(data)
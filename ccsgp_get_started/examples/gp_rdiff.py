@@ -2,28 +2,202 @@ import logging, argparse, os, sys, re
 import numpy as np
 from fnmatch import fnmatch
 from collections import OrderedDict
-from .utils import getWorkDirs, eRanges, getEnergy4Key
-from .utils import getUArray, getEdges, getCocktailSum, enumzipEdges, getMassRangesSums
-from .utils import getErrorComponent
-from ..ccsgp.ccsgp import make_plot
+from .utils import getWorkDirs, loadDatFile, VersionInput, eRanges, getEnergy4Key
+from .utils import getUArray, getEdges, getIntegralIndex, getMassRangesSums
+from .utils import getDataPoint, getMassRangesScan, eRangesSystLMR
+from .render import make_plot, renderAsync
+from .normalization import getScaleFactors, scaled_versions
 from ..ccsgp.utils import getOpts, zip_flat
 from ..ccsgp.config import default_colors
-from uncertainties import ufloat
 
 labels = None
+norm_version = 'LatestPatrickJieYi' # version of scale factors (normalization)
 
+lmrWindows = [ [0.15, 0.75], [0.4, 0.75] ]
 dNdyPi0 = { '19.6': 52.8, '27': 57.6, '39': 60.8, '62.4': 77.2, '200': 105 }
 
-def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
+heatmap_cells = 50 # max. number of heatmap cells per axis (edges thinned out)
+heatmap_colors = [ # low -> high enhancement factor
+  '#313695', '#4575b4', '#abd9e9', '#ffffbf', '#fdae61', '#d73027', '#a50026'
+]
+scan_columns = [ 'data', 'model', 'rhofo', 'vacrho' ]
+
+def writeEnhancementScan(outDir, version, xfacs, lmrScanEdges):
+  """write LMR window scan of enhancement factors for all energies
+
+  - xfacsVERSION.dat: one gnuplot data block per energy (`index`) with
+    columns lower edge, upper edge, data enhancement factor w/ stat. and
+    syst. uncertainty, and the enhancement factors of model (medium),
+    rhofo and vacrho (NaN if not available), an empty line after each lower
+    edge to plot it as heatmap (`with image`)
+  - xfacsSpreadVERSION.dat: spread of the data enhancement factors over all
+    windows (energy, mean, std.dev., min., max.)
+
+  :param xfacs: energy -> dict of UArray scans for scan_columns
+  """
+  low, upp = [ e.ravel() for e in np.meshgrid(*lmrScanEdges, indexing = 'ij') ]
+  nan = np.full(low.shape, np.nan)
+  spread = []
+  with open(os.path.join(outDir, 'xfacs%s.dat' % version), 'w') as f:
+    f.write('# lower upper %s stat. syst. %s\n' % (
+      scan_columns[0], ' '.join(scan_columns[1:])
+    ))
+    for energy, uScans in xfacs.iteritems():
+      f.write('# %s GeV\n' % energy)
+      uScan = uScans['data']
+      table = np.column_stack([
+        low, upp, uScan.nominal.ravel(), uScan.stat.ravel(), uScan.syst.ravel()
+      ] + [
+        uScans[k].nominal.ravel() if k in uScans else nan
+        for k in scan_columns[1:]
+      ])
+      for block in np.split(table, len(lmrScanEdges[0])):
+        np.savetxt(f, block, fmt = '%g')
+        f.write('\n')
+      f.write('\n')
+      vals = uScan.nominal[np.isfinite(uScan.nominal)]
+      spread.append([
+        float(energy), vals.mean(), vals.std(), vals.min(), vals.max()
+      ])
+  np.savetxt(
+    os.path.join(outDir, 'xfacsSpread%s.dat' % version), spread, fmt = '%g',
+    header = 'energy mean std.dev. min. max.'
+  )
+
+def _heatmapBounds(edges):
+  # cell boundaries centered on (thinned out) scan edges
+  edges = np.asarray(edges, dtype=float)
+  if len(edges) < 2: return edges - 0.025, edges + 0.025
+  mid = 0.5*(edges[1:] + edges[:-1])
+  bounds = np.r_[2*edges[0] - mid[0], mid, 2*edges[-1] - mid[-1]]
+  return bounds[:-1], bounds[1:]
+
+def heatColor(f):
+  """color for f in [0, 1] interpolated linearly in heatmap_colors"""
+  rgb = np.array([
+    [ int(c[i:i+2], 16) for i in [1, 3, 5] ] for c in heatmap_colors
+  ], dtype=float)
+  pos = np.clip(f, 0., 1.) * (len(rgb) - 1)
+  i = min(int(pos), len(rgb) - 2)
+  return '#%02x%02x%02x' % tuple(
+    int(round(v)) for v in rgb[i] + (pos - i)*(rgb[i+1] - rgb[i])
+  )
+
+def plotEnhancementScan(outDir, version, xfacs, lmrScanEdges):
+  """heatmaps of the data enhancement factors in the LMR window scan
+
+  - one plot per energy (xfacsMapVERSION_ENERGY), lower vs upper window
+    edge, cells drawn as colored rectangles (gnuplot objects) on a common
+    color scale for all energies
+  - at most heatmap_cells cells per axis, finer scans are thinned out
+  """
+  sel = [
+    np.unique(np.linspace(0, len(e)-1, min(len(e), heatmap_cells)).round().astype(int))
+    for e in lmrScanEdges
+  ]
+  (x0, x1), (y0, y1) = [ _heatmapBounds(np.asarray(e)[s]) for e, s in zip(lmrScanEdges, sel) ]
+  maps = OrderedDict(
+    (energy, uScans['data'].nominal[np.ix_(*sel)])
+    for energy, uScans in xfacs.iteritems()
+  )
+  vals = np.concatenate([ m[np.isfinite(m)] for m in maps.values() ])
+  if not vals.size: return
+  vmin, vmax = vals.min(), vals.max()
+  pseudo_point = np.array([[-1,1,0,0,0]])
+  for energy, m in maps.iteritems():
+    gpcalls = [
+      'object %d rectangle back from %g,%g to %g,%g fc rgb "%s" fs solid noborder' % (
+        100 + i*m.shape[1] + j, x0[i], y0[j], x1[i], y1[j],
+        heatColor((m[i,j] - vmin) / (vmax - vmin) if vmax > vmin else 0.5)
+      ) for i in xrange(m.shape[0]) for j in xrange(m.shape[1])
+      if np.isfinite(m[i,j])
+    ] + [
+      'label 1 "{/=18 %s GeV}" at graph 0.05,0.93' % energy,
+      'label 2 "{/=14 enhancement factor %.2f (blue) - %.2f (red)}" at graph 0.05,0.86' % (
+        vmin, vmax
+      ),
+    ]
+    make_plot(
+      data = [ pseudo_point ], properties = [ 'lt 1 lw 4 ps 0 lc rgb "white"' ],
+      titles = [ '' ],
+      name = os.path.join(outDir, 'xfacsMap%s_%s' % (
+        version, energy.replace('.', 'p')
+      )),
+      xlabel = 'lower LMR edge (GeV/c^{2})',
+      ylabel = 'upper LMR edge (GeV/c^{2})',
+      xr = [x0[0], x1[-1]], yr = [y0[0], y1[-1]], gpcalls = gpcalls,
+      size = '8in,8in'
+    )
+
+def getRdiffInput(version):
+  """load input of gp_rdiff once for all plot modes (see gp_rdiff_absrel)
+
+  - returns dict of OrderedDict's with arrays per energy for the data types
+    data, cocktail, medium, rho and vacRho (scaled & cut for all modes)
+  - keeps per-energy intermediates shared by all plot modes in 'shared'
+  """
+  inDir, outDir = getWorkDirs()
+  inDir = os.path.join(inDir, version)
+  inputs = dict(
+    (data_type, OrderedDict())
+    for data_type in ['data', 'cocktail', 'medium', 'rho', 'vacRho']
+  )
+  inputs['shared'] = {}
+  # LatestPatrickJieYi factors for all scaled versions (incl. QM14)
+  # QM14: 19 GeV skipped later, factor only informational
+  scale = getScaleFactors(norm_version) if version in scaled_versions else {}
+  vin = VersionInput(inDir)
+  for infile, energyKey, data_type in vin.entries():
+    if data_type not in inputs: continue
+    energy = getEnergy4Key(energyKey)
+    data_import = vin.load(infile)
+    if data_type != 'data' and (
+        (version == 'QM14' and energy != '19.6') or version == 'LatestPatrickJieYi'
+    ):
+       data_import[:,(1,3,4)] /= scale[energyKey].nominal_value
+    if version == 'LatestPatrickJieYi':
+        if data_type == 'data':
+            data_import = data_import[(data_import[:,0] > 0.14) & (data_import[:,0] < 1.0)]
+        else:
+            data_import = data_import[data_import[:,0] < 1.0]
+    inputs[data_type][energy] = data_import
+  return inputs
+
+@renderAsync
+def gp_rdiff_absrel(
+  version, nomed, noxerr, divdNdy, nscan = None, scanRanges = None
+):
+  """absolute and relative gp_rdiff plots from input loaded & rebinned once
+
+  produces the same outputs as gp_rdiff with diffRel False and True
+  """
+  inputs = getRdiffInput(version)
+  for diffRel in [False, True]:
+    gp_rdiff(
+      version, nomed, noxerr, diffRel, divdNdy, nscan, scanRanges,
+      inputs = inputs
+    )
+  return 'done'
+
+@renderAsync
+def gp_rdiff(
+  version, nomed, noxerr, diffRel, divdNdy, nscan = None, scanRanges = None,
+  inputs = None
+):
   """example for ratio or difference plots using QM12 data (see gp_panel)
 
-  - uses uncertainties package for easier error propagation and rebinning
+  - uses UArray (columnar stat/syst arrays, see utils) for error
+    propagation and rebinning
   - stat. error for medium = 0!
   - stat. error for cocktail ~ 0!
   - statistical error bar on data stays the same for diff
   - TODO: implement ratio!
   - TODO: adjust statistical error on data for ratio!
   - TODO: adjust name and ylabel for ratio
+  - plots are rendered asynchronously while the next one is computed
+  - relative mode: LMR window scan of the enhancement factors written to
+    xfacs*.dat and drawn as heatmaps (see writeEnhancementScan and
+    plotEnhancementScan)
 
   .. image:: pics/diffAbsQM12.png
      :width: 450 px
@@ -34,40 +208,22 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
   :type nomed: bool
   :param noxerr: don't plot x-errors
   :type noxerr: bool
+  :param nscan: number of lower/upper edges in LMR window scan (default: 6)
+  :type nscan: int
+  :param scanRanges: [min., max.] of lower and upper edges in LMR window
+    scan (default: range of eRangesSystLMR)
+  :type scanRanges: list
+  :param inputs: input loaded via getRdiffInput (to share between modes)
+  :type inputs: dict
   """
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version)
-  data, cocktail, medium, rhofo, vacrho = \
-          OrderedDict(), OrderedDict(), OrderedDict(), OrderedDict(), OrderedDict()
-  #scale = { # QM14 (19 GeV skip later, factor here only informational)
-  #  '19.6': 1.0340571932983775, '200': 1.0, '39': 0.7776679085382481,
-  #  '27': 0.6412140408244136, '62.4': 0.9174700031778402
-  #}
-  scale = {
-      '19.6': 1.3410566491548412, '200': 1.1051002240771077,
-      '39': 1.2719203877292842, '27': 1.350873678084769,
-      '62.4': 1.2664666321635087
-  }
+  if inputs is None: inputs = getRdiffInput(version)
+  data, cocktail = inputs['data'], inputs['cocktail']
+  medium, rhofo, vacrho = OrderedDict(), OrderedDict(), OrderedDict()
   yunit = 1.0e-3 if not diffRel else 1.
-  for infile in os.listdir(inDir):
-    if infile == "cocktail_contribs": continue
-    energy = re.compile('\d+').search(infile).group()
-    data_type = re.sub('%s\.dat' % energy, '', infile)
-    energy = getEnergy4Key(energy)
-    file_url = os.path.join(inDir, infile)
-    data_import = np.loadtxt(open(file_url, 'rb'))
-    if data_type != 'data' and (
-        (version == 'QM14' and energy != '19.6') or version == 'LatestPatrickJieYi'
-    ):
-       data_import[:,(1,3,4)] /= scale[energy]
-    if version == 'LatestPatrickJieYi':
-        if data_type == 'data':
-            data_import = data_import[(data_import[:,0] > 0.14) & (data_import[:,0] < 1.0)]
-        else:
-            data_import = data_import[data_import[:,0] < 1.0]
-    if data_type == 'data': data[energy] = data_import
-    elif data_type == 'cocktail': cocktail[energy] = data_import
-    elif data_type == 'rho' or data_type == 'vacRho' or data_type == 'medium':
+  for data_type in ['rho', 'vacRho', 'medium']:
+    for energy, data_import in inputs[data_type].iteritems():
+        data_import = data_import.copy() # input shared by all plot modes
         if noxerr and not diffRel: data_import[:,2:] = 0.
         data_import[:,1] /= yunit
         if data_type == 'rho':
@@ -86,13 +242,14 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
   }
   dataOrdered = OrderedDict()
   for energy in sorted(data, key=float, reverse=True):
-    # data & bin edges
-    # getUArray propagates stat/syst errors separately internally but
-    # errors need to be doubled to retrieve correct errors
-    uData = getUArray(data[energy])
-    eData = getEdges(data[energy])
-    uCocktail = getUArray(cocktail[energy])
-    eCocktail = getEdges(cocktail[energy])
+    # data & bin edges, cocktail integral index (shared by all plot modes)
+    # getUArray propagates stat/syst errors separately (see UArray)
+    if energy not in inputs['shared']:
+      inputs['shared'][energy] = (
+        getUArray(data[energy]), getEdges(data[energy]),
+        getIntegralIndex(cocktail[energy])
+      )
+    uData, eData, iCocktail = inputs['shared'][energy]
     loop = [eData]
     if energy in medium and diffRel:
       uMedium = getUArray(medium[energy])
@@ -108,27 +265,20 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
       loop.append(eVacRho)
     # loop data/medium bins
     for l, eArr in enumerate(loop):
-      for i, (e0, e1) in enumzipEdges(eArr):
-        logging.debug('%s/%d> %g - %g:' % (energy, l, e0, e1))
-        # get cocktail sum in data bin range
-        # value+/-0.5*tot.uncert.
-        uCocktailSum = getCocktailSum(e0, e1, eCocktail, uCocktail)
-        if uCocktailSum == 0.: continue
-        # calc. difference and divide by data binwidth again
-        # + set data point
+      # get cocktail sums in all data/medium bin ranges at once
+      uCocktailSums = iCocktail.sums(eArr[:-1], eArr[1:])
+      # calc. difference and divide by data binwidth again
+      # + set data points
+      with np.errstate(divide='ignore', invalid='ignore'):
         if l == 0:
-          uDiff = uData[i] # value+/-0.5*tot.uncert.
           if diffRel:
-            uDiff /= uCocktailSum # value+/-0.5*tot.uncert.
+            uDiff = uData / uCocktailSums
           else:
-            uDiff -= uCocktailSum
-            uDiff /= data[energy][i,2] * 2 * yunit
-          dp = [
-            data[energy][i,0], uDiff.nominal_value,
-            data[energy][i,2] if not noxerr else 0.,
-            getErrorComponent(uDiff, 'stat'),
-            getErrorComponent(uDiff, 'syst')
-          ]
+            uDiff = uData - uCocktailSums
+            uDiff /= data[energy][:,2] * 2 * yunit
+          dps = getDataPoint(
+            data[energy][:,0], uDiff, data[energy][:,2] if not noxerr else 0.
+          )
           key = ' '.join([energy, 'GeV'])
           if noxerr:
               if diffRel:
@@ -138,42 +288,39 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
                   key += ' {/Symbol \264} 10^{%s}' % expon
         elif l == 1:
           # only done if diffRel
-          uDiff = uMedium[i]
-          uDiff /= uCocktailSum
-          dp = [
-            medium[energy][i,0], uDiff.nominal_value+1,
-            medium[energy][i,2] if not noxerr else 0.,
-            0., 0. # both errors included in data points
-          ]
+          uDiff = uMedium / uCocktailSums
+          dps = getDataPoint( # both errors included in data points
+            medium[energy][:,0], uDiff.nominal_value+1,
+            medium[energy][:,2] if not noxerr else 0.
+          )
           key = ' '.join([energy, 'GeV (Med.)'])
         elif l == 2:
           # only done if diffRel
-          uDiff = uRho[i]
-          uDiff /= uCocktailSum
-          dp = [
-            rhofo[energy][i,0], uDiff.nominal_value+1.,
-            rhofo[energy][i,2] if not noxerr else 0.,
-            0., 0. # both errors included in data points
-          ]
+          uDiff = uRho / uCocktailSums
+          dps = getDataPoint( # both errors included in data points
+            rhofo[energy][:,0], uDiff.nominal_value+1.,
+            rhofo[energy][:,2] if not noxerr else 0.
+          )
           key = ' '.join([energy, 'GeV (RhoFO.)'])
         elif l == 3:
           # only done if diffRel
-          uDiff = uVacRho[i]
-          uDiff /= uCocktailSum
-          dp = [
-            vacrho[energy][i,0], uDiff.nominal_value+1.,
-            vacrho[energy][i,2] if not noxerr else 0.,
-            0., 0. # both errors included in data points
-          ]
+          uDiff = uVacRho / uCocktailSums
+          dps = getDataPoint( # both errors included in data points
+            vacrho[energy][:,0], uDiff.nominal_value+1.,
+            vacrho[energy][:,2] if not noxerr else 0.
+          )
           key = ' '.join([energy, 'GeV (VacRho.)'])
-        # build list of data points
-        if diffRel or l == 0:
-          if dp[0] > 0.7425 and dp[0] < 0.825: continue # mask out omega region
-          if dp[0] > 0.97 and dp[0] < 1.0495: continue # mask out phi region
-        if key in dataOrdered:
-            dataOrdered[key] = np.vstack([dataOrdered[key], dp])
-        else:
-            dataOrdered[key] = np.array([ dp ])
+      # build array of data points (skip bins w/o cocktail)
+      mask = (uCocktailSums.nominal != 0.)
+      if diffRel or l == 0:
+        x = dps[:,0]
+        mask &= ~((x > 0.7425) & (x < 0.825)) # mask out omega region
+        mask &= ~((x > 0.97) & (x < 1.0495)) # mask out phi region
+      if not np.any(mask): continue
+      if key in dataOrdered:
+          dataOrdered[key] = np.vstack([dataOrdered[key], dps[mask]])
+      else:
+          dataOrdered[key] = dps[mask]
     if not diffRel:
       if energy in medium:
         dataOrdered[' '.join([energy, 'GeV (Med.)'])] = medium[energy]
@@ -262,94 +409,80 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
 
   # integrated enhancement factor
   if diffRel:
-    enhance = {}
+    enhance, xfacs = {}, OrderedDict()
     data_enhance, medium_enhance, rhofo_enhance, vacrho_enhance = None, None, None, None
+    if nscan is None and scanRanges is None: lmrScanEdges = eRangesSystLMR
+    else:
+      lmrScanEdges = [
+        np.linspace(r[0], r[-1], nscan or len(e))
+        for r, e in zip(scanRanges or eRangesSystLMR, eRangesSystLMR)
+      ]
     for energy in sorted(data, key=float):
-      for systLMR in [False, True]:
-        suffix = str(energy)
-        uEnhanceData = getMassRangesSums(
-          data[energy], onlyLMR = True,
-          systLMR = systLMR, suffix = suffix
+      # build integral indices once for all mass range sums
+      index = dict(
+        (k, getIntegralIndex(d[energy])) for k, d in [
+          ('data', data), ('medium', medium), ('rhofo', rhofo),
+          ('vacrho', vacrho)
+        ] if energy in d
+      )
+      index['cocktail'] = inputs['shared'][energy][2]
+      suffix = str(energy)
+      uEnhanceData = getMassRangesSums(
+        index['data'], onlyLMR = True, suffix = suffix
+      )
+      uEnhanceCocktail = getMassRangesSums(
+        index['cocktail'], onlyLMR = True, suffix = suffix
+      )
+      uEnhanceData /= uEnhanceCocktail
+      dp = getDataPoint(float(energy), uEnhanceData)
+      if data_enhance is None: data_enhance = [ dp ]
+      else: data_enhance.append(dp)
+      if energy in medium:
+        uEnhanceMed = getMassRangesSums(
+          index['medium'], onlyLMR = True, suffix = suffix
         )
-        uEnhanceCocktail = getMassRangesSums(
-          cocktail[energy], onlyLMR = True,
-          systLMR = systLMR, suffix = suffix
+        uEnhanceMed /= uEnhanceCocktail
+        dpM = [ float(energy), uEnhanceMed.nominal_value+1., 0, 0, 0 ]
+        if medium_enhance is None: medium_enhance = [ dpM ]
+        else: medium_enhance.append(dpM)
+      if energy in rhofo:
+        uEnhanceRhoFO = getMassRangesSums(
+          index['rhofo'], onlyLMR = True, suffix = suffix
         )
-        if energy in medium:
-          uEnhanceMed = getMassRangesSums(
-            medium[energy], onlyLMR = True,
-            systLMR = systLMR, suffix = suffix
-          )
-        if energy in rhofo:
-          uEnhanceRhoFO = getMassRangesSums(
-            rhofo[energy], onlyLMR = True,
-            systLMR = systLMR, suffix = suffix
-          )
-        if energy in vacrho:
-          uEnhanceVacRho = getMassRangesSums(
-            vacrho[energy], onlyLMR = True,
-            systLMR = systLMR, suffix = suffix
-          )
-        if not systLMR: # uEnhance's are ufloats
-          uEnhanceData /= uEnhanceCocktail
-          dp = [
-              float(energy), uEnhanceData.nominal_value, 0,
-              getErrorComponent(uEnhanceData, 'stat'),
-              getErrorComponent(uEnhanceData, 'syst')
-          ]
-          if data_enhance is None: data_enhance = [ dp ]
-          else: data_enhance.append(dp)
-          if energy in medium:
-            uEnhanceMed /= uEnhanceCocktail
-            dpM = [ float(energy), uEnhanceMed.nominal_value+1., 0, 0, 0 ]
-            if medium_enhance is None: medium_enhance = [ dpM ]
-            else: medium_enhance.append(dpM)
-          if energy in rhofo:
-            uEnhanceRhoFO /= uEnhanceCocktail
-            dpM = [ float(energy), uEnhanceRhoFO.nominal_value+1., 0, 0, 0 ]
-            if rhofo_enhance is None: rhofo_enhance = [ dpM ]
-            else: rhofo_enhance.append(dpM)
-          if energy in vacrho:
-            uEnhanceVacRho /= uEnhanceCocktail
-            dpM = [ float(energy), uEnhanceVacRho.nominal_value+1., 0, 0, 0 ]
-            if vacrho_enhance is None: vacrho_enhance = [ dpM ]
-            else: vacrho_enhance.append(dpM)
-        else: # uEnhance's are dicts of ufloats
-          for k in uEnhanceData:
-            uEnhanceData[k] /= uEnhanceCocktail[k]
-            dp = [
-              float(energy), uEnhanceData[k].nominal_value, 0,
-              getErrorComponent(uEnhanceData[k], 'stat'),
-              getErrorComponent(uEnhanceData[k], 'syst')
-            ]
-            rngstr = k.split('_')[-1]
-            data_key = 'data_' + rngstr
-            if data_key not in enhance: enhance[data_key] = [ dp ]
-            else: enhance[data_key].append(dp)
-            if k in uEnhanceMed:
-              uEnhanceMed[k] /= uEnhanceCocktail[k]
-              dpM = [ float(energy), uEnhanceMed[k].nominal_value ]
-              med_key = 'model_' + rngstr
-              if med_key not in enhance: enhance[med_key] = [ dpM ]
-              else: enhance[med_key].append(dpM)
-            if k in uEnhanceRhoFO:
-              uEnhanceRhoFO[k] /= uEnhanceCocktail[k]
-              dpM = [ float(energy), uEnhanceRhoFO[k].nominal_value+1. ]
-              rhofo_key = 'rhofo_' + rngstr
-              if rhofo_key not in enhance: enhance[rhofo_key] = [ dpM ]
-              else: enhance[rhofo_key].append(dpM)
-            if k in uEnhanceVacRho:
-              uEnhanceVacRho[k] /= uEnhanceCocktail[k]
-              dpM = [ float(energy), uEnhanceVacRho[k].nominal_value+1. ]
-              vacrho_key = 'vacrho_' + rngstr
-              if vacrho_key not in enhance: enhance[vacrho_key] = [ dpM ]
-              else: enhance[vacrho_key].append(dpM)
-    xfacs = os.path.join(outDir, 'xfacs%s.dat' % version)
-    if os.path.exists(xfacs): os.remove(xfacs)
-    fSystLMR = open(xfacs, 'ab')
-    for k in sorted(enhance.keys()):
-      np.savetxt(fSystLMR, enhance[k], fmt = '%g', header = k, comments = '\n\n')
-    fSystLMR.close()
+        uEnhanceRhoFO /= uEnhanceCocktail
+        dpM = [ float(energy), uEnhanceRhoFO.nominal_value+1., 0, 0, 0 ]
+        if rhofo_enhance is None: rhofo_enhance = [ dpM ]
+        else: rhofo_enhance.append(dpM)
+      if energy in vacrho:
+        uEnhanceVacRho = getMassRangesSums(
+          index['vacrho'], onlyLMR = True, suffix = suffix
+        )
+        uEnhanceVacRho /= uEnhanceCocktail
+        dpM = [ float(energy), uEnhanceVacRho.nominal_value+1., 0, 0, 0 ]
+        if vacrho_enhance is None: vacrho_enhance = [ dpM ]
+        else: vacrho_enhance.append(dpM)
+      # enhancement factors in LMR windows shown in plot
+      for rng in lmrWindows:
+        uEnhance = getMassRangesSums(
+          index['data'], customRanges = rng, singleRange = True
+        ) / getMassRangesSums(
+          index['cocktail'], customRanges = rng, singleRange = True
+        )
+        data_key = 'data_%g-%g' % tuple(rng)
+        dp = getDataPoint(float(energy), uEnhance)
+        if data_key not in enhance: enhance[data_key] = [ dp ]
+        else: enhance[data_key].append(dp)
+      # window-choice syst.: enhancement factors for all LMR windows at once
+      uScanCocktail = getMassRangesScan(index['cocktail'], *lmrScanEdges)
+      xfacs[energy] = OrderedDict(
+        (k, getMassRangesScan(index[i], *lmrScanEdges) / uScanCocktail + offset)
+        for k, i, offset in [
+          ('data', 'data', 0.), ('model', 'medium', 0.),
+          ('rhofo', 'rhofo', 1.), ('vacrho', 'vacrho', 1.)
+        ] if i in index
+      )
+    writeEnhancementScan(outDir, version, xfacs, lmrScanEdges)
+    plotEnhancementScan(outDir, version, xfacs, lmrScanEdges)
     yr_upp = 4 if version == 'QM12Latest200' or version == 'QM14' else 7
     if version == 'LatestPatrickJieYi': yr_upp = 5.5
     #labels.update({
@@ -411,10 +544,7 @@ def gp_rdiff(version, nomed, noxerr, diffRel, divdNdy):
     if fnmatch(k, '*VacRho.*'): suffix = '_VacRho'
     exc = getMassRangesSums(np.array(v), onlyLMR = True)
     if divdNdy: exc /= dNdyPi0[energy] * 1e-2
-    dp = [
-        float(energy), exc.nominal_value, 0,
-        getErrorComponent(exc, 'stat'), getErrorComponent(exc, 'syst')
-    ]
+    dp = getDataPoint(float(energy), exc)
     if suffix == '_Med' and not diffRel and not divdNdy:
         print dp
     key = 'LMR' + suffix
@@ -500,13 +630,13 @@ def gp_rdiff_merged(version, divdNdy):
       '/ dN/dy|_{/Symbol \\160}  ' if divdNdy else '', 5 if divdNdy else 3
   )
   if os.path.exists(enhance_datdir) and os.path.exists(excess_datdir):
-      excess_data = np.loadtxt(
-          open(os.path.join(
+      excess_data = loadDatFile(
+          os.path.join(
               excess_datdir,
               'LMR_Excess_Yield_%s_Symbol_10_%d_.dat' % (
                   'dN_dy___Symbol_160' if divdNdy else '', 5 if divdNdy else 3
               )
-          ), 'rb')
+          )
       )
       avdata = np.array(excess_data)
       avg = np.average(avdata[:,1], weights = avdata[:,4])
@@ -525,8 +655,8 @@ def gp_rdiff_merged(version, divdNdy):
       #data['LMR Enhancement Factor'] = np.loadtxt(
       #    open(os.path.join(enhance_datdir, 'LMR_Enhancement_Factor.dat'), 'rb')
       #)
-      data['Model for Excess'] = np.loadtxt(
-          open(os.path.join(excess_datdir, 'Model.dat'), 'rb')
+      data['Model for Excess'] = loadDatFile(
+          os.path.join(excess_datdir, 'Model.dat')
       )
       #data['Model for Enhancement'] = np.loadtxt(
       #    open(os.path.join(enhance_datdir, 'Model.dat'), 'rb')
@@ -568,12 +698,34 @@ if __name__ == '__main__':
   parser.add_argument("--nomed", help="don't plot medium", action="store_true")
   parser.add_argument("--noxerr", help="no dx errors", action="store_true")
   parser.add_argument("--diffRel", help="plot relative difference (ratio)", action="store_true")
+  parser.add_argument("--absRel", help="plot absolute & relative difference", action="store_true")
   parser.add_argument("--divdNdy", help="divide excess plot by dNdy_pi0", action="store_true")
+  parser.add_argument("--nscan", type=int, help="number of lower/upper edges in LMR window scan")
+  parser.add_argument(
+    "--scanLow", type=float, nargs=2, metavar=("MIN", "MAX"),
+    help="range of lower edges in LMR window scan"
+  )
+  parser.add_argument(
+    "--scanUpp", type=float, nargs=2, metavar=("MIN", "MAX"),
+    help="range of upper edges in LMR window scan"
+  )
   parser.add_argument("--log", help="show log output", action="store_true")
   args = parser.parse_args()
   loglevel = 'DEBUG' if args.log else 'WARNING'
   logging.basicConfig(
     format='%(message)s', level=getattr(logging, loglevel)
   )
-  print gp_rdiff(args.version, args.nomed, args.noxerr, args.diffRel, args.divdNdy)
+  scanRanges = None if args.scanLow is None and args.scanUpp is None else [
+    r or [ e[0], e[-1] ] for r, e in zip([args.scanLow, args.scanUpp], eRangesSystLMR)
+  ]
+  if args.absRel:
+    print gp_rdiff_absrel(
+      args.version, args.nomed, args.noxerr, args.divdNdy, args.nscan,
+      scanRanges
+    )
+  else:
+    print gp_rdiff(
+      args.version, args.nomed, args.noxerr, args.diffRel, args.divdNdy,
+      args.nscan, scanRanges
+    )
   #print gp_rdiff_merged(args.version,args.divdNdy)
@@ -1,9 +1,8 @@
 import os, argparse, logging
-from .utils import getWorkDirs, getEnergy4Key, particleLabel4Key
+from .utils import getWorkDirs, VersionInput, getEnergy4Key, particleLabel4Key
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_plot, make_panel
+from .render import make_plot, make_panel
 from ..ccsgp.config import default_colors
-import numpy as np
 
 energies = [19, 27, 39, 62]
 xlabel = 'dielectron invariant mass, M_{ee} (GeV/c^{2})'
@@ -16,7 +15,7 @@ def gp_sims(version):
   :type version: str
   """
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version, 'cocktail_contribs')
+  vin = VersionInput(os.path.join(inDir, version))
   xmax = {
       'pion': 0.125, 'eta': 0.52, 'etap': 0.92, 'omega': 1.22,
       'phi': 1.22, 'jpsi': 3.52
@@ -30,8 +29,7 @@ def gp_sims(version):
       for particle in particles:
           for energy in energies:
               fstem = particle+str(energy)
-              fname = os.path.join(inDir, fstem+'.dat')
-              contribs[fstem] = np.loadtxt(open(fname, 'rb'))
+              contribs[fstem] = vin.load(fstem+'.dat', 'cocktail_contribs')
               contribs[fstem][:,2:] = 0
       print contribs.keys()
       titles = [
@@ -66,12 +64,13 @@ def gp_sims_panel(version):
   :type version: str
   """
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version)
+  vin = VersionInput(os.path.join(inDir, version))
   mesons = ['pion', 'eta', 'etap', 'rho', 'omega', 'phi', 'jpsi']
-  fstems = ['cocktail_contribs/'+m for m in mesons] + ['cocktail', 'cocktail_contribs/ccbar']
+  fstems = [('cocktail_contribs', m) for m in mesons] + [
+      ('', 'cocktail'), ('cocktail_contribs', 'ccbar')
+  ]
   data = OrderedDict((energy, [
-      np.loadtxt(open(os.path.join(inDir, fstem+str(energy)+'.dat'), 'rb'))
-      for fstem in fstems
+      vin.load(fstem+str(energy)+'.dat', subdir) for subdir, fstem in fstems
   ]) for energy in energies)
   for v in data.values():
       # keep syserrs for total cocktail
@@ -106,11 +105,10 @@ def gp_sims_total_overlay(version):
   :type version: str
   """
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version)
+  vin = VersionInput(os.path.join(inDir, version))
   data = OrderedDict()
   for energy in energies:
-      fname = os.path.join(inDir, 'cocktail'+str(energy)+'.dat')
-      data[energy] = np.loadtxt(open(fname, 'rb'))
+      data[energy] = vin.load('cocktail'+str(energy)+'.dat')
       data[energy][:,2:] = 0
   make_plot(
       data = data.values(),
@@ -136,11 +134,10 @@ def gp_sims_totalerrors_overlay(version):
   :type version: str
   """
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version)
+  vin = VersionInput(os.path.join(inDir, version))
   data = OrderedDict()
   for energy in energies:
-      fname = os.path.join(inDir, 'cocktail'+str(energy)+'.dat')
-      data[energy] = np.loadtxt(open(fname, 'rb'))
+      data[energy] = vin.load('cocktail'+str(energy)+'.dat')
       data[energy][:,1] = data[energy][:,4]/data[energy][:,1]
       data[energy][:,2:] = 0
   make_plot(
@@ -1,42 +1,188 @@
-import logging, argparse, os, sys, re, math, random
+import logging, argparse, os, sys, math, multiprocessing
 import numpy as np
 from fnmatch import fnmatch
 from collections import OrderedDict
-from .utils import getWorkDirs, getEnergy4Key
-from .utils import particleLabel4Key, getMassRangesSums, getErrorComponent
-from ..ccsgp.ccsgp import make_plot
+from .utils import getWorkDirs, VersionInput, getEnergy4Key
+from .utils import particleLabel4Key
+from .render import make_plot, renderAsync
+from .fitting import fitLinear, evalLinear
+from .normalization import getScaleFactors
 from ..ccsgp.utils import getOpts
 from ..ccsgp.config import default_colors
 from uncertainties import ufloat
-from decimal import Decimal
-
-try:
-    from pymodelfit import LinearModel
-    linmod = LinearModel()
-except ImportError:
-    linmod = None
 
 dataIMRfit_style = 'with lines lc %s lw 4 lt 1' % default_colors[-2]
 cocktailIMRfit_style = 'with lines lc %s lw 4 lt 2' % default_colors[-2]
 pseudo_point = np.array([ [-1,1e-7,0,0,1] ])
 
-def truncated_gaus(r, mu, sig):
-    while 1:
-        x = r.gauss(mu, sig)
-        if x > 0: return x
+rangeIMR = [1.15, 2.5] # mass range for IMR slope fits
+nToysMC = 1000 # default number of MC toys for IMR slope uncertainty
+toyChunkSize = 100000 # max. number of MC toys drawn & fitted at once
+# number of worker processes for per-energy input processing (0 = serial)
+energy_workers = int(os.environ.get('CCSGP_STACK_WORKERS', 0))
+
+def truncatedGaus(rs, mu, sig, size):
+  """gaussian random numbers truncated to x > 0 (vectorized rejection)"""
+  mu, sig = mu + np.zeros(size), sig + np.zeros(size) # numpy 1.9: no broadcast_to
+  x = rs.normal(mu, sig)
+  bad = ~(x > 0)
+  while bad.any(): # redraw rejected numbers only
+    x[bad] = rs.normal(mu[bad], sig[bad])
+    bad = ~(x > 0)
+  return x
+
+def getIMRSlopeMC(dataIMR, nToys = None, seed = 0):
+  """Monte-Carlo the IMR data points within dx/dy -> slope mean & std.dev.
+
+  - toys drawn in chunks as (nToys x nPoints) arrays, x uniform within dx and
+    y gaussian within dy truncated to y > 0 (TODO: syst. uncertainties)
+  - independent x/y streams per chunk via RandomState([seed, axis, chunk])
+  - all toys of a chunk fitted at once (see fitting.fitLinear)
+  - mean & std.dev. weighted by inverse std.dev. of fit residuals
+
+  :param nToys: number of toys (default: nToysMC)
+  :param seed: int or list of ints (e.g. [seed, energy])
+  """
+  nToys = nToysMC if nToys is None else nToys
+  x0, y0, dx, dy = [ dataIMR[:,c] for c in xrange(4) ]
+  slopes, weights = [], []
+  for chunk, start in enumerate(xrange(0, nToys, toyChunkSize)):
+    size = (min(toyChunkSize, nToys - start), len(dataIMR))
+    rx, ry = [
+      np.random.RandomState(list(np.atleast_1d(seed)) + [ax, chunk])
+      for ax in xrange(2)
+    ]
+    x = rx.uniform(x0 - dx, x0 + dx, size)
+    y = truncatedGaus(ry, y0, dy, size)
+    y = np.log10(y)
+    params = fitLinear(x, y)[0]
+    slopes.append(params[:,0])
+    # std.dev. of residuals w/ ddof = 0 as pymodelfit's stdData (np.std)
+    weights.append(1./(y - evalLinear(params, x)).std(axis=-1))
+  slopes, weights = np.concatenate(slopes), np.concatenate(weights)
+  avg = np.average(slopes, weights=weights)
+  return avg, math.sqrt(np.average((slopes-avg)**2, weights=weights))
+
+def getEnergySeed(seed, energy):
+  """MC seed for an energy, independent of input order & number of workers"""
+  return [seed, int(float(getEnergy4Key(energy))*10)]
+
+def processEnergy(task):
+  """load and IMR-fit the input files of a single energy
+
+  - task = (inDir, energy, files, inclFits, nToys, seed) with files a list
+    of (filename, data_type)
+  - runs in worker processes (see mapEnergies), MC seeded via getEnergySeed
+  - returns dict of (data_import, IMR fit) per filename with IMR fit =
+    (m, b, slope parameter, slope parameter error) or None
+  """
+  inDir, energy, files, inclFits, nToys, seed = task
+  vin = VersionInput(inDir)
+  results = {}
+  for filename, data_type in files:
+    data_import = vin.load(filename)
+    fit = None
+    # fit IMR region with exp(-M/kT+C)
+    if inclFits and (data_type == 'data' or data_type == 'cocktail'):
+      # data in IMR
+      mask = (data_import[:,0] > rangeIMR[0]) & (data_import[:,0] < rangeIMR[1])
+      dataIMR = data_import[mask]
+      # exp fit in IMR region -> slope parameter
+      # z = log10(y) => dz = dy/(y*ln10), TODO: include syst. uncertainties
+      mIMR, bIMR = fitLinear(
+          dataIMR[:,0], np.log10(dataIMR[:,1]), dataIMR[:,2],
+          dataIMR[:,3]/(dataIMR[:,1]*math.log(10.))
+      )[0]
+      slope_par = -1./mIMR
+      logging.info('%s: m = %g , b = %g => T = %g' % (filename, mIMR, bIMR, slope_par))
+      # Monte-Carlo the datapoints within dx/dy -> parameter mean & std.dev.
+      slope_par_err = 0.
+      if data_type == 'data':
+        for i,dp in enumerate(dataIMR): # for each datapoint
+          logging.info(('MC %d: x = {}, y = {}' % i).format(
+            ufloat(dp[0], dp[2]), ufloat(dp[1], dp[3]) # TODO: syst. uncertainties
+          ))
+        mIMRMC_avg, mIMRMC_std = getIMRSlopeMC(
+          dataIMR, nToys, getEnergySeed(seed, energy)
+        )
+        umIMR = ufloat(mIMRMC_avg, mIMRMC_std)
+        slope_par_err = abs(mIMRMC_std/mIMRMC_avg * slope_par)
+        logging.info(('=> %g == {} => err = %g' % (mIMR, slope_par_err)).format(umIMR))
+      fit = (mIMR, bIMR, slope_par, slope_par_err)
+    results[filename] = (data_import, fit)
+  return results
+
+def mapEnergies(tasks, nworkers = None):
+  """run processEnergy for all tasks on a worker pool (see energy_workers)
+
+  daemonic processes (e.g. the jobs of ``python -m ccsgp_get_started
+  --jobs N``) always process serially
+  """
+  nworkers = energy_workers if nworkers is None else nworkers
+  if (
+    nworkers < 2 or len(tasks) < 2 or
+    multiprocessing.current_process().daemon
+  ): return map(processEnergy, tasks)
+  pool = multiprocessing.Pool(min(nworkers, len(tasks)))
+  try: return pool.map(processEnergy, tasks, chunksize = 1)
+  finally:
+    pool.close()
+    pool.join()
+
+def getStackInput(version, inclFits, nToys = None, seed = 0, nworkers = None):
+  """load & fit gp_stack input for all energies once
 
-def gp_stack(version, energies, inclMed, inclFits):
+  - per-energy input processed in parallel (see mapEnergies)
+  - returns dict w/ 19 GeV cocktail contributions ('contribs'), the input
+    entries and processEnergy results per filename ('entries', 'results')
+  - shared by all frames of gp_stack_frames (arrays must not be modified)
+  """
+  inDir, outDir = getWorkDirs()
+  inDir = os.path.join(inDir, version)
+  vin = VersionInput(inDir)
+  contribs = OrderedDict()
+  for subdir in vin.subdirs():
+    for fn, energy, particle in vin.entries(subdir):
+      if energy != '19': continue
+      if version == 'QM14' and energy == '19' and particle == 'jpsi': continue
+      contribs[particle] = vin.load(fn, subdir)
+  entries, tasks = list(vin.entries()), OrderedDict()
+  for filename, energy, data_type in entries:
+    tasks.setdefault(energy, []).append((filename, data_type))
+  results = {}
+  for r in mapEnergies([
+    (inDir, energy, files, inclFits, nToys, seed)
+    for energy, files in tasks.iteritems()
+  ], nworkers): results.update(r)
+  return { 'contribs': contribs, 'entries': entries, 'results': results }
+
+def gp_stack(
+  version, energies, inclMed, inclFits, nToys = None, seed = 0, nworkers = None,
+  inputs = None, frame = None
+):
   """example for a plot w/ stacked graphs using QM12 data (see gp_panel)
 
   * how to omit keys from the legend
   * manually add legend entries
   * automatically plot arrows for error bars larger than data point value
+  * IMR slopes vs. energy in IMRslope<version> w/ inclFits (only made w/o
+    inclMed, the slopes don't depend on the medium calculations)
 
   .. image:: pics/stackQM12.png
      :width: 550px
 
   :param version: plot version / input subdir name
   :type version: str
+  :param nToys: number of MC toys for IMR slope uncertainty (default: nToysMC)
+  :type nToys: int
+  :param seed: seed for MC toys (combined with energy)
+  :type seed: int
+  :param nworkers: number of processes for per-energy input (see mapEnergies)
+  :type nworkers: int
+  :param inputs: input loaded via getStackInput (default: load input)
+  :type inputs: dict
+  :param frame: number of animation frame (output name suffix)
+  :type frame: int
   """
   inclMed = (inclMed and version != 'QM12')
   inclFits = (inclFits and version == 'LatestPatrickJieYi')
@@ -54,94 +200,32 @@ def gp_stack(version, energies, inclMed, inclFits):
   if version == 'QM14':
       shift = { '200': 200., '62': 25., '39': 2., '27': 0.03, '19': 2e-3 }
   inDir, outDir = getWorkDirs()
-  inDir = os.path.join(inDir, version)
   data, cocktail, medium = OrderedDict(), OrderedDict(), OrderedDict()
   dataIMRfit, cocktailIMRfit, dataTvsS = OrderedDict(), OrderedDict(), OrderedDict()
   cocktailContribs, medOnly, qgpOnly = OrderedDict(), OrderedDict(), OrderedDict()
-  rangeIMR = [1.15, 2.5]
-  nPtsMC = 1000 # number of MC points per data point
-  cRanges = map(Decimal, ['0.', '0.1'])
-  pi0yld = {}
-  for filename in os.listdir(inDir):
-    file_url = os.path.join(inDir, filename)
-    # take care of cocktail contributions first
-    if os.path.isdir(file_url):
-        for fn in os.listdir(file_url):
-            energy = re.compile('\d+').search(fn).group()
-            particle = re.sub('%s\.dat' % energy, '', fn)
-            if energy != '19': continue
-            if version == 'QM14' and energy == '19' and particle == 'jpsi': continue
-            cocktailContribs[particle] = np.loadtxt(open(
-                os.path.join(file_url, fn), 'rb'
-            ))
-            if particle == 'omega' or particle == 'phi' or particle == 'ccbar':
-                thr = 0.95 if particle == 'omega' else 1.4
-                if particle == 'ccbar': thr = 2.6
-                mask = cocktailContribs[particle][:,0] < thr
-                cocktailContribs[particle] = cocktailContribs[particle][mask]
-            cocktailContribs[particle][:,(1,3,4)] *= shift[energy]
-            cocktailContribs[particle][:,2:] = 0
-        continue
-    # normal input files
-    energy = re.compile('\d+').search(filename).group()
-    data_type = re.sub('%s\.dat' % energy, '', filename)
-    data_import = np.array([[-1, 1, 0, 0, 0]]) if (
-      energies is not None and energy not in energies
-    ) else np.loadtxt(open(file_url, 'rb'))
-    # fit IMR region with exp(-M/kT+C)
-    if (
-      inclFits and energies is None and linmod is not None and
-      (data_type == 'data' or data_type == 'cocktail')
-    ):
-      # data in IMR
-      mask = (data_import[:,0] > rangeIMR[0]) & (data_import[:,0] < rangeIMR[1])
-      dataIMR = data_import[mask]
-      # exp fit in IMR region -> slope parameter
-      mIMR, bIMR = linmod.fitErrxy(
-          dataIMR[:,0], np.log10(dataIMR[:,1]), dataIMR[:,2],
-          np.log10(dataIMR[:,3]) # TODO: include syst. uncertainties
-      )
-      slope_par = -1./mIMR
-      logging.info('%s: m = %g , b = %g => T = %g' % (filename, mIMR, bIMR, slope_par))
-      # Monte-Carlo the datapoints within dx/dy -> parameter mean & std.dev.
-      slope_par_err = 0.
-      if data_type == 'data':
-        # one random generator per x,y for each data point in IMR
-        rndm = OrderedDict((ax,[]) for ax in ['x','y'])
-        rndm_jump = 0
-        dataMC = OrderedDict((n, []) for n in xrange(nPtsMC))
-        for i,dp in enumerate(dataIMR): # for each datapoint
-          logging.info(('MC %d: x = {}, y = {}' % i).format(
-            ufloat(dp[0], dp[2]), ufloat(dp[1], dp[3]) # TODO: syst. uncertainties
-          ))
-          for ax in rndm: # for each axis
-            rndm[ax].append(random.Random())
-            if ax == 'y' and i == 0: # jumpahead y-axis
-              rndm[ax][i].setstate(rndm['x'][i].getstate())
-              rndm[ax][i].jumpahead(nPtsMC)
-            if i > 0: # jumpahead within axes
-              rndm[ax][i].setstate(rndm[ax][i-1].getstate())
-              rndm[ax][i].jumpahead(nPtsMC)
-          for n in xrange(nPtsMC): # generate nPtsMC new points for current datapoint
-            dataMC[n].append([
-              rndm['x'][i].uniform(dp[0] - dp[2], dp[0] + dp[2]),
-              truncated_gaus(rndm['y'][i], dp[1], dp[3])
-            ])
-            #logging.info(' %d: x = %g, y = %g' % (n, dataMC[n][i][0], dataMC[n][i][1]))
-        mIMRMC = []
-        for dp in dataMC.itervalues():
-          dp = np.array(dp)
-          mIMRMC.append([
-            linmod.fitBasic(dp[:,0], np.log10(dp[:,1]))[0][0],
-            linmod.stdData(x=dp[:,0], y=np.log10(dp[:,1]))
-          ])
-        mIMRMC = np.array(mIMRMC)
-        weights = 1./mIMRMC[:,1]
-        mIMRMC_avg = np.average(mIMRMC[:,0], weights=weights)
-        mIMRMC_var = np.average((mIMRMC[:,0]-mIMRMC_avg)**2, weights=weights)
-        umIMR = ufloat(mIMRMC_avg, math.sqrt(mIMRMC_var))
-        slope_par_err = abs(math.sqrt(mIMRMC_var)/mIMRMC_avg * slope_par)
-        logging.info(('=> %g == {} => err = %g' % (mIMR, slope_par_err)).format(umIMR))
+  if inputs is None:
+    inputs = getStackInput(
+      version, inclFits and energies is None, nToys, seed, nworkers
+    )
+  # take care of cocktail contributions first
+  for particle, contrib in inputs['contribs'].iteritems():
+      cocktailContribs[particle] = contrib.copy() # input shared by frames
+      if particle == 'omega' or particle == 'phi' or particle == 'ccbar':
+          thr = 0.95 if particle == 'omega' else 1.4
+          if particle == 'ccbar': thr = 2.6
+          mask = cocktailContribs[particle][:,0] < thr
+          cocktailContribs[particle] = cocktailContribs[particle][mask]
+      cocktailContribs[particle][:,(1,3,4)] *= shift['19']
+      cocktailContribs[particle][:,2:] = 0
+  # normal input files (dummy point for energies not selected)
+  for filename, energy, data_type in inputs['entries']:
+    data_import, fit = inputs['results'][filename]
+    if energies is not None and energy not in energies:
+      data_import, fit = np.array([[-1., 1., 0., 0., 0.]]), None
+    else:
+      data_import = data_import.copy() # input shared by frames
+    if inclFits and fit is not None and energies is None:
+      mIMR, bIMR, slope_par, slope_par_err = fit
       # set IMR slope datapoint
       IMRfit = np.array([ [x, math.pow(10.,mIMR*x+bIMR), 0., 0., 0.] for x in rangeIMR ])
       IMRfit[:,(1,3,4)] *= shift[energy]
@@ -151,10 +235,6 @@ def gp_stack(version, energies, inclMed, inclFits):
       dp = [ float(getEnergy4Key(energy)), slope_par, 0., slope_par_err, 0. ]
       if data_type in dataTvsS: dataTvsS[data_type].append(dp)
       else: dataTvsS[data_type] = [ dp ]
-    if data_type != '+medium':
-      pi0yld['_'.join([energy,data_type])] = getMassRangesSums(
-        np.copy(data_import), customRanges = cRanges , singleRange = True
-      )
     # function changes syst. uncertainties of input numpy array
     # following scaling is wrong for y < 0 && shift != 1
     data_import[:,(1,3,4)] *= shift[energy]
@@ -180,24 +260,13 @@ def gp_stack(version, energies, inclMed, inclFits):
           qgpOnly[energy] = data_import if version != 'QM14' else data_import[data_import[:,0] < 1.07]
       if fnmatch(filename, '*Med*'):
           medOnly[energy] = data_import if version != 'QM14' else data_import[data_import[:,0] < 1.07]
-  # calculate data-to-cocktail scaling factors in pi0 region < 0.1 GeV/c2
-  # cocktail/data
-  scale = {}
-  for e in ['19', '27', '39', '62', '200' ]:
-      if version == 'QM12' and e == '27': continue
-      a, b = pi0yld[e+'_cocktail'], pi0yld[e+'_data']
-      z = a/b
-      scale[e] = ufloat(z.nominal_value, z.std_dev*2)
-      # checked the following
-      # z = a/b, dz = sqrt((da/b)^2+(db*a/b^2)^2) = z*sqrt((da/a)^2+(db/b)^2)
-      #scale_err[e] = 0.
-      #for err in ['stat', 'syst']:
-      #    aerr_rel, berr_rel = getErrorComponent(a, err), getErrorComponent(b, err)
-      #    aerr_rel /= a.nominal_value
-      #    berr_rel /= b.nominal_value
-      #    scale_err[e] += aerr_rel**2+berr_rel**2
-      #scale_err[e] = scale[e] * math.sqrt(scale_err[e])
-      #print scale_err[e], (a/b).std_dev*2 # are equal
+  # data-to-cocktail scaling factors in pi0 region < 0.1 GeV/c2
+  # cocktail/data (see normalization)
+  factors = getScaleFactors(version)
+  scale = dict(
+    (e, factors[e]) for e in ['19', '27', '39', '62', '200' ]
+    if not (version == 'QM12' and e == '27')
+  )
   print scale
   print ['{}: {}'.format(k, 1./v) for k,v in scale.iteritems()]
   if version == 'QM14' or version == 'LatestPatrickJieYi': # scale cocktail to data
@@ -262,6 +331,7 @@ def gp_stack(version, energies, inclMed, inclFits):
     + [''] * nSetsCocktailIMRfit + [''] * inclFits,
     name = os.path.join(outDir, 'stack%s%s%s%s' % (
       version, 'InclMed' if inclMed else '', 'InclFits' if inclFits else '',
+      '_frame%02d' % frame if frame is not None else
       '_' + '-'.join(energies) if energies is not None else ''
     )),
     ylabel = '1/N@_{mb}^{evt} dN@_{ee}^{acc.}/dM_{ee} [ (GeV/c^2)^{-1} ]',
@@ -284,7 +354,7 @@ def gp_stack(version, energies, inclMed, inclFits):
     #  [ [2.4, 5e-5], [2.3, 1e-5], 'head filled lc 1 lw 4 lt 1 front' ],
     #],
   )
-  if inclFits:
+  if inclFits and not inclMed: # same w/ medium, made only once
     for t in dataTvsS: dataTvsS[t].sort(key=lambda x: x[0])
     make_plot(
       data = [ np.array(dataTvsS['cocktail']), np.array(dataTvsS['data']) ],
@@ -303,16 +373,48 @@ def gp_stack(version, energies, inclMed, inclFits):
     )
   return 'done'
 
+@renderAsync
+def gp_stack_frames(version, inclMed, energies = None, nworkers = None):
+  """cumulative energy build-up of gp_stack as numbered frame sequence
+
+  - input loaded once and shared by all frames (see getStackInput)
+  - frame i shows the first i energies (default: all in ascending order)
+    in ``stack<version>[InclMed]_frame<i>``
+  - frames are rendered asynchronously, in parallel with a render pool
+    (see render.render_workers)
+
+  :param energies: energies in order of appearance
+  :type energies: list
+  """
+  inputs = getStackInput(version, False, nworkers = nworkers)
+  if energies is None:
+    energies = sorted(set(e for fn, e, dt in inputs['entries']), key=int)
+  for i in xrange(len(energies)):
+    gp_stack(
+      version, energies[:i+1], inclMed, False, inputs = inputs, frame = i+1
+    )
+  return 'done'
+
 if __name__ == '__main__':
   parser = argparse.ArgumentParser()
   parser.add_argument("version", help="version = subdir name of input dir")
   parser.add_argument("--energies", nargs='*', help="list of energies to plot (for animation)")
   parser.add_argument("--med", help="include medium calculations", action="store_true")
   parser.add_argument("--fit", help="include IMR fits", action="store_true")
+  parser.add_argument("--frames", help="energy build-up animation frames (see --energies)", action="store_true")
+  parser.add_argument("--ntoys", type=int, help="number of MC toys for IMR slope uncertainty")
+  parser.add_argument("--seed", type=int, default=0, help="seed for MC toys")
+  parser.add_argument("--workers", type=int, help="number of processes for per-energy input")
   parser.add_argument("--log", help="show log output", action="store_true")
   args = parser.parse_args()
   loglevel = 'DEBUG' if args.log else 'WARNING'
   logging.basicConfig(
     format='%(message)s', level=getattr(logging, loglevel)
   )
-  print gp_stack(args.version, args.energies, args.med, args.fit)
+  if args.frames:
+    print gp_stack_frames(args.version, args.med, args.energies, args.workers)
+  else:
+    print gp_stack(
+      args.version, args.energies, args.med, args.fit, args.ntoys, args.seed,
+      args.workers
+    )
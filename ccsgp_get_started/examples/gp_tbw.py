@@ -1,7 +1,7 @@
 import os, argparse, logging, math
-from .utils import getWorkDirs, getEnergy4Key, particleLabel4Key
+from .utils import getWorkDirs, loadDatFile, getEnergy4Key, particleLabel4Key
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_plot, make_panel
+from .render import make_plot, make_panel
 from ..ccsgp.config import default_colors
 import numpy as np
 from scipy.interpolate import interp1d
@@ -24,9 +24,9 @@ def gp_tbw(shift = False):
             for cidx,code in enumerate(codes):
                 for dtype in dtypes:
                     filename = '_'.join([dtype, code, energy]) + '.dat'
-                    data_import = np.loadtxt(open(
-                        os.path.join(inDir, filename), 'rb'
-                    ))
+                    data_import = loadDatFile(
+                        os.path.join(inDir, filename)
+                    )
                     if shift: data_import[:,(1,3,4)] *= scale[energy]
                     props = None
                     if dtype == 'data':
@@ -1,8 +1,7 @@
 import logging, argparse, os, sys
-import numpy as np
 from collections import OrderedDict
-from ..ccsgp.ccsgp import make_plot
-from .utils import getWorkDirs
+from .render import make_plot
+from .utils import getWorkDirs, loadDatFile
 from ..ccsgp.utils import getOpts
 
 shift = {
@@ -37,7 +36,7 @@ def gp_xfac():
       ]) + ' GeV'
     ])
     file_url = os.path.join(inDir, file)
-    data[key] = np.loadtxt(open(file_url, 'rb')).reshape((-1,5))
+    data[key] = loadDatFile(file_url).reshape((-1,5))
     data[key][:, 0] *= shift.get(key, 1)
   logging.debug(data) # shown if --log flag given on command line
   # generate plot
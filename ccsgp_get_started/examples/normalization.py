@@ -0,0 +1,93 @@
+"""data-to-cocktail normalization (scale factors) shared by all examples
+
+- scale factor per energy = cocktail/data yield in the pi0 region (cRanges)
+  from the data & cocktail input of gp_stack for a data version
+- computed once per version and persisted with uncertainties in
+  normCacheDir/<version>.json, keyed by size & mtime of the input files
+- normInputDir is the input dir of gp_stack (see getModuleDirs), a missing
+  version dir/bundle is a critical error (exit) as in getWorkDirs
+- getScaleFactors(version) is queried by gp_stack, gp_panel, gp_rdiff and
+  gp_ptspec instead of hardcoding the factors
+"""
+import os, sys, logging, hashlib, tempfile, json
+import numpy as np
+from .utils import VersionInput, getMassRangesSums, getModuleDirs
+from uncertainties import ufloat
+
+normInputDir = getModuleDirs(
+  os.path.join(os.path.dirname(__file__), 'gp_stack.py')
+)[0]
+normCacheDir = os.path.join('output', '.normcache')
+cRanges = [ 0., 0.1 ] # mass range for pi0 yield
+scaled_versions = [ 'QM14', 'LatestPatrickJieYi' ] # cocktail scaled to data
+
+def _inputKey(inDir):
+  # hash of size & mtime of all input files (bundle and directory, the
+  # bundle isn't used if outdated, see VersionInput)
+  sha1 = hashlib.sha1(repr(cRanges))
+  bundle_url = inDir + '.npz'
+  urls = [ bundle_url ] if os.path.exists(bundle_url) else []
+  if os.path.isdir(inDir):
+    urls += sorted(
+      os.path.join(inDir, fn) for fn in os.listdir(inDir)
+      if not os.path.isdir(os.path.join(inDir, fn))
+    )
+  for url in urls:
+    st = os.stat(url)
+    sha1.update(repr((os.path.abspath(url), st.st_size, st.st_mtime)))
+  return sha1.hexdigest()
+
+def calcScaleFactors(version):
+  """calculate scale factors (cocktail/data in pi0 region) for all energies
+
+  returns dict of energy -> (nominal, stat., syst.)
+  """
+  vin = VersionInput(os.path.join(normInputDir, version))
+  pi0yld = {}
+  for filename, energy, data_type in vin.entries():
+    if data_type != 'data' and data_type != 'cocktail': continue
+    pi0yld[energy, data_type] = getMassRangesSums(
+      np.copy(vin.load(filename)), customRanges = cRanges , singleRange = True
+    )
+  factors = {}
+  for (energy, data_type), b in pi0yld.iteritems():
+    if data_type != 'data' or (energy, 'cocktail') not in pi0yld: continue
+    # z = a/b, dz = sqrt((da/b)^2+(db*a/b^2)^2) = z*sqrt((da/a)^2+(db/b)^2)
+    z = pi0yld[energy, 'cocktail'] / b
+    factors[energy] = tuple(float(getattr(z, k)) for k in ['nominal', 'stat', 'syst'])
+  return factors
+
+def getScaleFactors(version):
+  """get scale factors for data version as dict of energy -> ufloat
+
+  - read from cache file or calculated & cached if input changed (see
+    calcScaleFactors)
+  - uncertainty = stat. and syst. uncertainties added in quadrature
+  """
+  inDir = os.path.join(normInputDir, version)
+  if not os.path.exists(inDir) and not os.path.exists(inDir + '.npz'):
+    logging.critical('create input dir %s (or its bundle) for the %s scale factors to continue!' % (
+      inDir, version
+    ))
+    sys.exit(1)
+  key = _inputKey(inDir)
+  cache_url = os.path.join(normCacheDir, '%s.json' % version)
+  factors = None
+  if os.path.exists(cache_url):
+    with open(cache_url, 'r') as f: cache = json.load(f)
+    if cache['key'] == key: factors = cache['factors']
+  if factors is None:
+    factors = calcScaleFactors(version)
+    if not os.path.exists(normCacheDir):
+      try: os.makedirs(normCacheDir)
+      except OSError: pass # already exists
+    # write to temp. file & rename to be safe for concurrent runs
+    fd, tmp_url = tempfile.mkstemp(suffix = '.json', dir = normCacheDir)
+    with os.fdopen(fd, 'w') as f:
+      json.dump({ 'key': key, 'factors': factors }, f, indent = 1, sort_keys = True)
+    os.rename(tmp_url, cache_url)
+    logging.debug('cached scale factors for %s in %s' % (version, cache_url))
+  return dict(
+    (str(energy), ufloat(nominal, np.hypot(stat, syst)))
+    for energy, (nominal, stat, syst) in factors.iteritems()
+  )
@@ -0,0 +1,634 @@
+"""drop-in replacements for ccsgp's make_plot/make_panel w/ a render pool
+
+- gnuplot processes are long-lived and reused by consecutive plots instead
+  of starting gnuplot for every plot (GnuplotSession, installed in ccsgp's
+  gnuplot-py); a session is reset between plots (``reset session``), i.e.
+  no state is carried over from one plot to the next; CCSGP_REUSE_SESSIONS=0
+  to start a fresh gnuplot per plot
+- data sets with at least binary_threshold values (CCSGP_BINARY_THRESHOLD)
+  are handed to gnuplot as binary doubles (``binary format="%5double"``)
+  instead of being formatted to text and parsed again (binaryData,
+  installed as gnuplot-py's Data)
+- enqueued plots (asynchronous mode, see below) are rendered by a pool of
+  long-lived render threads while the caller goes on, all reusing the idle
+  gnuplot sessions, so renders overlap with each other and with the caller;
+  pool size is set via CCSGP_RENDER_WORKERS (default: number of cpus) or
+  initRenderPool
+- further output formats (``terminals`` argument or CCSGP_TERMINALS, e.g.
+  ``pdf,png``) are converted from the rendered pdf via pdftocairo instead of
+  rerunning the plot; pdftocairo (poppler-utils) is needed for all formats
+  other than pdf, checked before a plot is rendered
+- in asynchronous mode (asyncRendering/renderAsync) make_plot/make_panel
+  only enqueue the plot and return a RenderHandle, waitRenders is the barrier
+  waiting for all enqueued plots; w/o render threads (render_workers = 0)
+  plots are rendered right away in asynchronous mode as well
+- in dry-run mode (dry_run or CCSGP_DRY_RUN=1) gnuplot isn't invoked at all,
+  make_plot/make_panel return a serializable PlotSpec instead which is also
+  collected in plot_specs (to be saved and rendered later)
+- opt-in cache of outputs (incl. ccsgp's <name>/ data dir and the
+  returned result) in render_cache_dir keyed by a hash of all plot arguments
+  (incl. data arrays) and the ccsgp sources, gnuplot is skipped for cached
+  plots; the cache is bounded (CCSGP_RENDER_CACHE_MB, default: 0 = off) with
+  least-recently-used entries evicted first
+- opt-in decimation of large data sets to a point budget per data set
+  (``decimate`` argument): min./max. per x column (or LTTB) for lines,
+  error-aware merging of adjacent points otherwise
+"""
+import os, logging, atexit, tempfile, shutil, subprocess, cPickle
+import sys, hashlib, glob, time, math, shlex, threading
+from multiprocessing import cpu_count
+from distutils.spawn import find_executable
+from multiprocessing.pool import ThreadPool
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
+from collections import OrderedDict
+from ..ccsgp import ccsgp
+try: from ..ccsgp import Gnuplot as gnuplotpy
+except ImportError: gnuplotpy = None # gnuplot sessions not reused
+
+render_workers = int(os.environ.get('CCSGP_RENDER_WORKERS', cpu_count()))
+reuse_sessions = bool(int(os.environ.get('CCSGP_REUSE_SESSIONS', 1)))
+gnuplot_command = os.environ.get('CCSGP_GNUPLOT', 'gnuplot')
+binary_threshold = int(os.environ.get('CCSGP_BINARY_THRESHOLD', 100000))
+output_terminals = os.environ.get('CCSGP_TERMINALS', 'pdf').split(',')
+png_resolution = 150 # dpi
+converted_terminals = [ 'png', 'svg', 'eps', 'ps' ] # via pdftocairo
+render_async = False
+dry_run = bool(int(os.environ.get('CCSGP_DRY_RUN', 0)))
+plot_specs = [] # PlotSpec's collected in dry-run mode
+plot_outputs = [] # output files of all plots made (e.g. to check for builds)
+render_cache_dir = os.path.join('output', '.rendercache')
+render_cache_size = int(os.environ.get('CCSGP_RENDER_CACHE_MB', 0)) * 1024**2
+_pool, _pending, _ccsgpDigest = None, [], None
+_idleSessions, _sessionsLock = [], threading.Lock()
+
+class GnuplotSession(object):
+  """long-lived gnuplot process shared by consecutive plots
+
+  - stands in for gnuplot-py's GnuplotProcess (see openSession), i.e. ccsgp
+    talks to it via write/flush/__call__ as to a fresh gnuplot process
+  - close() keeps gnuplot running: the output file is closed, the session
+    reset and returned to the idle sessions once gnuplot processed all
+    commands (see sync)
+  """
+  def __init__(self):
+    self.process = subprocess.Popen(
+      shlex.split(gnuplot_command), stdin = subprocess.PIPE,
+      stdout = subprocess.PIPE, close_fds = True
+    )
+    self.gnuplot, self.leased, self._nsync = self.process.stdin, False, 0
+    self.owner = os.getpid() # not shared w/ forked processes
+    # clears all state incl. user variables & functions (gnuplot >= 5.2)
+    self.reset = 'reset session' if float(self.query('GPVAL_VERSION')) >= 5.2 \
+        else 'reset'
+    logging.debug('started gnuplot session %d' % self.process.pid)
+
+  def write(self, s): self.process.stdin.write(s)
+
+  def flush(self): self.process.stdin.flush()
+
+  def __call__(self, s):
+    self.write(s + '\n')
+    self.flush()
+    if s.strip() == 'set output': self.sync() # output file complete
+
+  def query(self, expr):
+    """value of a gnuplot expression (as string)"""
+    self('set print "-"\nprint %s' % expr)
+    line = self.process.stdout.readline()
+    if not line: raise RuntimeError('gnuplot session died')
+    return line.strip()
+
+  def sync(self):
+    """block until gnuplot processed all commands sent so far"""
+    self._nsync += 1
+    marker = 'ccsgp_sync_%d' % self._nsync
+    self('set print "-"\nprint "%s"' % marker)
+    for line in iter(self.process.stdout.readline, ''):
+      if line.strip() == marker: return
+    raise RuntimeError('gnuplot session died')
+
+  def alive(self): return self.process.poll() is None
+
+  def close(self):
+    """end of plot: reset & return to idle sessions (see releaseSession)"""
+    if self.leased: releaseSession(self)
+
+  def terminate(self):
+    """end the gnuplot process"""
+    try: self.process.stdin.close()
+    except IOError: pass # already gone
+    self.process.wait()
+
+_gnuplotProcess = getattr(getattr(gnuplotpy, 'gp', None), 'GnuplotProcess', None)
+
+def openSession(persist = None):
+  """gnuplot process for a new plot: an idle GnuplotSession or a new one
+
+  installed as gnuplot-py's GnuplotProcess, falls back to the latter for
+  persistent windows or if reuse_sessions is off
+  """
+  if (persist or not reuse_sessions) and _gnuplotProcess is not None:
+    return _gnuplotProcess(persist = persist)
+  session = None
+  with _sessionsLock:
+    while _idleSessions and session is None:
+      session = _idleSessions.pop()
+      if session.owner != os.getpid() or not session.alive(): session = None
+  if session is None: session = GnuplotSession()
+  session.leased = True
+  return session
+
+def releaseSession(session):
+  """close output, reset session & keep it for the next plot
+
+  at most render_workers+1 sessions are kept idle (one per render thread
+  and the calling thread), others are terminated
+  """
+  session.leased = False
+  try:
+    session('set output')
+    session(session.reset)
+  except (IOError, ValueError, RuntimeError): # gnuplot died
+    session.terminate()
+    return
+  with _sessionsLock:
+    if len(_idleSessions) <= max(render_workers, 0):
+      _idleSessions.append(session)
+      return
+  session.terminate()
+
+def closeSessions():
+  """terminate all idle gnuplot sessions"""
+  with _sessionsLock:
+    sessions = list(_idleSessions)
+    del _idleSessions[:]
+  for session in sessions:
+    if session.owner == os.getpid(): session.terminate()
+
+atexit.register(closeSessions)
+
+if _gnuplotProcess is not None: gnuplotpy.gp.GnuplotProcess = openSession
+
+def writeBinary(arr, dirname = None):
+  """write 2d data array to a binary temp. file (native doubles)
+
+  returns file name and gnuplot's binary spec to read it
+  """
+  arr = np.ascontiguousarray(arr, dtype = '=f8')
+  fd, file_url = tempfile.mkstemp(suffix = '.bin', dir = dirname)
+  with os.fdopen(fd, 'wb') as f: arr.tofile(f)
+  return file_url, 'binary format="%%%ddouble"' % arr.shape[1]
+
+_fileItem = getattr(getattr(gnuplotpy, 'PlotItems', None), '_FileItem', None)
+_gnuplotData = getattr(getattr(gnuplotpy, 'PlotItems', None), 'Data', None)
+
+if _fileItem is not None:
+  class BinaryFileItem(_fileItem):
+    """gnuplot-py plot item of a data array in a binary temp. file
+
+    the file is removed with the item (like gnuplot-py's temp. files)
+    """
+    def __init__(self, arr, **keyw):
+      self.file_url, self.spec = writeBinary(arr)
+      _fileItem.__init__(self, self.file_url, **keyw)
+
+    def get_base_command_string(self):
+      return '%s %s' % (_fileItem.get_base_command_string(self), self.spec)
+
+    def __del__(self):
+      try: os.remove(self.file_url)
+      except OSError: pass # already removed
+
+def binaryData(*data, **keyw):
+  """gnuplot-py's Data w/ binary transfer of large data sets
+
+  a single 2d array with at least binary_threshold values becomes a
+  BinaryFileItem, all other data is passed to gnuplot-py's Data (text)
+  """
+  arr = data[0] if len(data) == 1 else None
+  if (
+    not isinstance(arr, np.ndarray) or arr.ndim != 2
+    or arr.size < binary_threshold or 'cols' in keyw or keyw.get('filename')
+  ): return _gnuplotData(*data, **keyw)
+  keyw.pop('inline', None)
+  return BinaryFileItem(arr, **keyw)
+
+if _fileItem is not None and _gnuplotData is not None:
+  # gnuplot-py's Data as imported by ccsgp & gnuplot-py itself
+  ccsgpPackage = ccsgp.__name__.rsplit('.', 1)[0]
+  for name, module in sys.modules.items():
+    if name.startswith(ccsgpPackage) and \
+       getattr(module, 'Data', None) is _gnuplotData:
+      module.Data = binaryData
+
+def _checkTerminals(terminals):
+  """raise before rendering for unknown terminals or a missing converter"""
+  unknown = set(terminals) - set(converted_terminals + [ 'pdf' ])
+  if unknown: raise ValueError('unknown output terminal(s) %s' % ', '.join(
+    sorted(unknown)
+  ))
+  if set(terminals) - set(['pdf']) and find_executable('pdftocairo') is None:
+    raise RuntimeError(
+      'pdftocairo (poppler-utils) not found, needed for output terminal(s) '
+      '%s (see CCSGP_TERMINALS)' % ', '.join(t for t in terminals if t != 'pdf')
+    )
+
+def _convert(name, terminals):
+  """derive further output formats from the pdf rendered by ccsgp"""
+  for term in terminals:
+    if term == 'pdf': continue
+    if term == 'png':
+      cmd = [
+        '-png', '-singlefile', '-r', str(png_resolution), name + '.pdf', name
+      ]
+    else: cmd = [ '-' + term, name + '.pdf', '.'.join([name, term]) ]
+    subprocess.check_call([ 'pdftocairo' ] + cmd)
+
+def _ccsgpSources():
+  """digest of the ccsgp sources (read once per process)"""
+  global _ccsgpDigest
+  if _ccsgpDigest is None:
+    sha1 = hashlib.sha1()
+    ccsgpDir = os.path.dirname(ccsgp.__file__)
+    for fn in sorted(glob.glob(os.path.join(ccsgpDir, '*.py'))):
+      with open(fn, 'rb') as f: sha1.update(f.read())
+    _ccsgpDigest = sha1.hexdigest()
+  return _ccsgpDigest
+
+def _hashPlot(kind, kwargs, terminals):
+  """content hash of a plot: arguments, data arrays & ccsgp sources"""
+  sha1 = hashlib.sha1(repr((kind, terminals, png_resolution)))
+  sha1.update(_ccsgpSources())
+  def update(obj):
+    if isinstance(obj, dict):
+      items = obj.items()
+      if not isinstance(obj, OrderedDict): items.sort()
+      for k, v in items:
+        sha1.update(repr(k))
+        update(v)
+    elif isinstance(obj, (list, tuple)):
+      sha1.update('[%d' % len(obj))
+      for v in obj: update(v)
+    elif isinstance(obj, np.ndarray) and obj.dtype == object:
+      update(obj.tolist())
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+      if id(obj) not in digests: # hash arrays shared by panels only once
+        digest = hashlib.sha1(repr((obj.dtype.str, obj.shape)))
+        digest.update(np.ascontiguousarray(obj).data)
+        digests[id(obj)] = digest.hexdigest()
+      sha1.update(digests[id(obj)])
+    else: sha1.update(repr(obj))
+  digests = {}
+  update(kwargs)
+  return sha1.hexdigest()
+
+def _entrySize(entry):
+  return sum(
+    os.path.getsize(os.path.join(root, fn))
+    for root, dirs, fns in os.walk(entry) for fn in fns
+  )
+
+def _restoreCached(key, name):
+  """copy cached outputs of a plot to their destination
+
+  returns (True, ccsgp result) for cached plots, (False, None) otherwise
+  """
+  entry = os.path.join(render_cache_dir, key)
+  try:
+    with open(os.path.join(entry, 'result.pkl'), 'rb') as f:
+      result = cPickle.load(f)
+    outDir = os.path.join(entry, 'outputs')
+    for fn in os.listdir(outDir):
+      shutil.copy(os.path.join(outDir, fn), name + fn)
+    datDir = os.path.join(entry, 'datdir')
+    if os.path.isdir(datDir): # ccsgp's <name>/ data dir
+      if os.path.isdir(name): shutil.rmtree(name)
+      shutil.copytree(datDir, name)
+    os.utime(entry, None) # mark as recently used
+  except (IOError, OSError, EOFError): return False, None # (being) evicted
+  logging.debug('%s: cached (%s)' % (name, key))
+  return True, result
+
+def _storeCached(key, name, start, result):
+  """store outputs of a plot rendered after start & evict LRU entries
+
+  outputs are <name>.* and the <name>/ data dir, plots w/ a ccsgp result
+  that can't be pickled aren't cached
+  """
+  fresh = lambda fn: os.path.getmtime(fn) >= start - 1
+  outputs = [
+    fn for fn in glob.glob(name + '.*') if os.path.isfile(fn) and fresh(fn)
+  ]
+  datDir = os.path.isdir(name) and any(
+    fresh(os.path.join(root, fn))
+    for root, dirs, fns in os.walk(name) for fn in fns
+  )
+  if not outputs and not datDir: return
+  try: pickled = cPickle.dumps(result, -1)
+  except Exception as e:
+    logging.debug('%s: not cached, result not picklable (%r)' % (name, e))
+    return
+  if not os.path.exists(render_cache_dir):
+    try: os.makedirs(render_cache_dir)
+    except OSError: pass # created concurrently
+  tmp = tempfile.mkdtemp(dir = render_cache_dir)
+  os.mkdir(os.path.join(tmp, 'outputs'))
+  for fn in outputs:
+    shutil.copy(fn, os.path.join(tmp, 'outputs', fn[len(name):]))
+  if datDir: shutil.copytree(name, os.path.join(tmp, 'datdir'))
+  with open(os.path.join(tmp, 'result.pkl'), 'wb') as f: f.write(pickled)
+  try: os.rename(tmp, os.path.join(render_cache_dir, key))
+  except OSError: shutil.rmtree(tmp) # stored concurrently
+  # evict least recently used entries exceeding render_cache_size
+  entries = []
+  for k in os.listdir(render_cache_dir):
+    entry = os.path.join(render_cache_dir, k)
+    try: entries.append((os.path.getmtime(entry), _entrySize(entry), entry))
+    except OSError: pass # evicted concurrently
+  total = sum(size for mtime, size, entry in entries)
+  for mtime, size, entry in sorted(entries):
+    if total <= render_cache_size: break
+    shutil.rmtree(entry, ignore_errors = True)
+    total -= size
+
+def _make(kind, kwargs):
+  """render plot in current process, all output formats from one session"""
+  terminals = kwargs.pop('terminals', None) or output_terminals
+  _checkTerminals(terminals)
+  name = kwargs.get('name')
+  key = _hashPlot(kind, kwargs, terminals) if (
+    render_cache_size > 0 and name is not None
+  ) else None
+  if key is not None:
+    cached, result = _restoreCached(key, name)
+    if cached: return result
+  start = time.time()
+  result = getattr(ccsgp, 'make_' + kind)(**kwargs)
+  if set(terminals) - set(['pdf']): _convert(name, terminals)
+  if key is not None: _storeCached(key, name, start, result)
+  return result
+
+def _walk(obj, func):
+  """apply func to all leaves of nested lists/tuples/dicts (plot arguments)"""
+  if isinstance(obj, dict):
+    return obj.__class__((k, _walk(v, func)) for k, v in obj.iteritems())
+  if isinstance(obj, (list, tuple)):
+    return obj.__class__(_walk(v, func) for v in obj)
+  return func(obj)
+
+class RenderHandle(object):
+  """handle of an enqueued plot"""
+  def __init__(self, name, result):
+    self.name, self._result = name, result
+
+  def ready(self):
+    """whether the plot is rendered (or failed)"""
+    return self._result.ready()
+
+  def wait(self):
+    """block until the plot is rendered, re-raises render errors"""
+    return self._result.get()
+
+def waitRenders():
+  """wait for all enqueued plots, raise RuntimeError for failed ones"""
+  failed = []
+  while _pending:
+    handle = _pending.pop(0)
+    try: handle.wait()
+    except Exception as e:
+      logging.error('rendering %s failed: %r' % (handle.name, e))
+      failed.append(handle.name)
+  if failed: raise RuntimeError('rendering failed for %s' % ', '.join(
+    str(name) for name in failed
+  ))
+
+@contextmanager
+def asyncRendering():
+  """render plots asynchronously within context, wait for all at exit
+
+  errors raised within the context propagate w/o waiting for the enqueued
+  plots (waited for by the next waitRenders or closeRenderPool)
+  """
+  global render_async
+  prev, render_async = render_async, True
+  try: yield
+  finally: render_async = prev
+  if not prev: waitRenders()
+
+def renderAsync(func):
+  """decorator to render plots of func asynchronously (see asyncRendering)"""
+  @wraps(func)
+  def wrapper(*args, **kwargs):
+    with asyncRendering(): return func(*args, **kwargs)
+  return wrapper
+
+class PlotSpec(object):
+  """serializable specification of a plot: kind (plot/panel) & arguments"""
+  def __init__(self, kind, kwargs):
+    self.kind = kind
+    # deep copy to decouple from later modifications of the data
+    self.kwargs = cPickle.loads(cPickle.dumps(kwargs, -1))
+
+  def __repr__(self):
+    return 'PlotSpec(%s, %s)' % (self.kind, self.kwargs.get('name'))
+
+  def render(self):
+    """render plot (via render pool if enabled)"""
+    return _dispatch(self.kind, dict(self.kwargs))
+
+def savePlotSpecs(file_url, specs):
+  """save list of PlotSpec's to file"""
+  with open(file_url, 'wb') as f:
+    cPickle.dump([ (spec.kind, spec.kwargs) for spec in specs ], f, -1)
+
+def loadPlotSpecs(file_url):
+  """load list of PlotSpec's from file (see savePlotSpecs)"""
+  with open(file_url, 'rb') as f:
+    return [ PlotSpec(kind, kwargs) for kind, kwargs in cPickle.load(f) ]
+
+def initRenderPool(nworkers = None):
+  """(re)start pool of render threads (nworkers = 0 to render in-process)"""
+  global _pool, render_workers
+  if nworkers is not None: render_workers = nworkers
+  closeRenderPool()
+  if render_workers > 0:
+    _pool = ThreadPool(render_workers)
+    logging.debug('started %d render threads' % render_workers)
+  return _pool
+
+def closeRenderPool():
+  """shut down render threads after all pending renders finished
+
+  raises RuntimeError for failed renders (see waitRenders)
+  """
+  global _pool
+  if _pool is None: return
+  try: waitRenders()
+  finally:
+    _pool.close()
+    _pool.join()
+    _pool = None
+
+atexit.register(closeRenderPool)
+
+def _dispatch(kind, kwargs):
+  if not render_async or render_workers < 1: return _make(kind, kwargs)
+  if _pool is None: initRenderPool()
+  # copy data right away to decouple from later modifications by the caller
+  kwargs = _walk(
+    kwargs, lambda obj: obj.copy() if isinstance(obj, np.ndarray) else obj
+  )
+  handle = RenderHandle(
+    kwargs.get('name'), _pool.apply_async(_make, (kind, kwargs))
+  )
+  _pending.append(handle)
+  return handle
+
+def lttb(arr, npts):
+  """largest-triangle-three-buckets downsampling of a line (sorted in x)"""
+  if len(arr) <= npts or npts < 3: return arr
+  x, y = arr[:,0], arr[:,1]
+  # buckets for all but first & last point
+  edges = np.linspace(1, len(arr)-1, npts-1).astype(int)
+  idx = [ 0 ]
+  for i in xrange(npts-2):
+    lo, hi = edges[i], edges[i+1]
+    if i < npts-3: # average of next bucket
+      ax, ay = x[hi:edges[i+2]].mean(), y[hi:edges[i+2]].mean()
+    else: ax, ay = x[-1], y[-1]
+    px, py = x[idx[-1]], y[idx[-1]]
+    area = np.abs((px-ax)*(y[lo:hi]-py) - (px-x[lo:hi])*(ay-py))
+    idx.append(lo + np.argmax(area))
+  idx.append(len(arr)-1)
+  return arr[idx]
+
+def minmaxDecimate(arr, npts):
+  """keep points w/ min. & max. y per x column (npts/2 columns)"""
+  if len(arr) <= npts: return arr
+  x, y = arr[:,0], arr[:,1]
+  ncol = max(npts // 2 - 1, 1)
+  span = x.max() - x.min()
+  col = np.zeros(len(x), dtype=int) if span <= 0 else np.minimum(
+    ((x - x.min()) / span * ncol).astype(int), ncol - 1
+  )
+  order = np.lexsort((y, col))
+  first = np.r_[True, col[order][1:] != col[order][:-1]]
+  last = np.r_[first[1:], True]
+  return arr[np.unique(np.r_[0, order[first], order[last], len(arr)-1])]
+
+def mergePoints(arr, npts):
+  """merge groups of adjacent points, propagating their uncertainties
+
+  y (and x w/o x-errors) is averaged, merged x-errors span all points of a
+  group and y-errors (columns 3+) are added in quadrature
+  """
+  if len(arr) <= npts: return arr
+  k = int(math.ceil(len(arr) / float(npts)))
+  starts = np.arange(0, len(arr), k)
+  n = np.diff(np.r_[starts, len(arr)]).astype(float)[:,np.newaxis]
+  out = np.add.reduceat(arr, starts) / n
+  if arr.shape[1] > 2:
+    lo = np.minimum.reduceat(arr[:,0]-arr[:,2], starts)
+    hi = np.maximum.reduceat(arr[:,0]+arr[:,2], starts)
+    hasdx = np.add.reduceat(np.abs(arr[:,2]), starts) > 0
+    out[:,0] = np.where(hasdx, 0.5*(lo+hi), out[:,0])
+    out[:,2] = np.where(hasdx, 0.5*(hi-lo), 0.)
+  if arr.shape[1] > 3:
+    out[:,3:] = np.sqrt(np.add.reduceat(arr[:,3:]**2, starts)) / n
+  return out
+
+def decimate(arr, npts, style = '', method = 'minmax'):
+  """reduce data set to about npts points for plotting
+
+  :param style: gnuplot properties of data set (lines/filledcurves or points)
+  :param method: minmax or lttb for lines
+  """
+  if not isinstance(arr, np.ndarray) or arr.ndim != 2 or len(arr) <= npts:
+    return arr
+  if 'lines' in style or 'filledcurves' in style:
+    return lttb(arr, npts) if method == 'lttb' else minmaxDecimate(arr, npts)
+  return mergePoints(arr, npts)
+
+def _decimateAll(datasets, styles, npts, method, done):
+  styles = list(styles or [])
+  styles += [ '' ] * (len(datasets) - len(styles))
+  for d, st in zip(datasets, styles): # data sets shared by panels only once
+    if (id(d), st) not in done: done[id(d), st] = decimate(d, npts, st, method)
+  return [ done[id(d), st] for d, st in zip(datasets, styles) ]
+
+def _submit(kind, kwargs):
+  npts = kwargs.pop('decimate', None)
+  method = kwargs.pop('decimate_method', 'minmax')
+  if npts and kind == 'plot':
+    kwargs['data'] = _decimateAll(
+      kwargs['data'], kwargs.get('properties'), npts, method, {}
+    )
+  elif npts:
+    done = {}
+    kwargs['dpt_dict'] = kwargs['dpt_dict'].__class__(
+      (k, [ _decimateAll(v[0], v[1], npts, method, done) ] + list(v[1:]))
+      for k, v in kwargs['dpt_dict'].iteritems()
+    )
+  if kwargs.get('name') is not None:
+    plot_outputs.extend(
+      '%s.%s' % (kwargs['name'], term)
+      for term in kwargs.get('terminals') or output_terminals
+    )
+  if not dry_run: return _dispatch(kind, kwargs)
+  plot_specs.append(PlotSpec(kind, kwargs))
+  return plot_specs[-1]
+
+def make_plot(**kwargs):
+  """ccsgp.make_plot rendered via render pool (same arguments)
+
+  :param terminals: output formats, subset of pdf/png/svg/eps/ps
+  :type terminals: list
+  :param decimate: point budget per data set (see decimate)
+  :type decimate: int
+  :param decimate_method: minmax or lttb for lines
+  :type decimate_method: str
+  """
+  return _submit('plot', kwargs)
+
+def pageLayout(layout, npanels):
+  """layout RxC (rows x columns) for a page of npanels panels
+
+  keeps the number of columns of the full layout, rows as needed
+  """
+  if layout is None: return None
+  ncols = min(int(layout.split('x')[1]), npanels)
+  return '%dx%d' % (int(math.ceil(npanels / float(ncols))), ncols)
+
+def make_panel(**kwargs):
+  """ccsgp.make_panel rendered via render pool (same arguments)
+
+  - large grids can be split into pages of panels_per_page panels, named
+    <name>_p<page> and rendered concurrently (see asyncRendering), the
+    layout of each page is derived from its number of panels (pageLayout)
+  - data arrays shared by several panels are hashed, decimated and handed to
+    the render workers only once
+
+  :param terminals: output formats, subset of pdf/png/svg/eps/ps
+  :type terminals: list
+  :param decimate: point budget per data set (see decimate)
+  :type decimate: int
+  :param decimate_method: minmax or lttb for lines
+  :type decimate_method: str
+  :param panels_per_page: max. number of panels per page
+  :type panels_per_page: int
+  """
+  per_page = kwargs.pop('panels_per_page', None)
+  dpt_dict = kwargs['dpt_dict']
+  if not per_page or len(dpt_dict) <= per_page: return _submit('panel', kwargs)
+  items, pages = dpt_dict.items(), []
+  with asyncRendering():
+    for i in xrange(0, len(items), per_page):
+      page = dict(kwargs)
+      page['dpt_dict'] = dpt_dict.__class__(items[i:i+per_page])
+      page['layout'] = pageLayout(kwargs.get('layout'), len(page['dpt_dict']))
+      if page['layout'] is None: del page['layout']
+      page['name'] = '%s_p%d' % (kwargs['name'], i/per_page+1)
+      pages.append(_submit('panel', page))
+  return pages
@@ -1,138 +1,492 @@
-import sys, os, itertools, inspect, logging, math
+import sys, os, re, itertools, inspect, logging, math, hashlib, tempfile, json
+import errno
 import numpy as np
-from uncertainties import ufloat
-from uncertainties.umath import fsum
-from decimal import Decimal
+from collections import OrderedDict
 mass_titles = [ 'pi0', 'LMR', 'omphi', 'IMR' ]
-eRanges = np.array([ Decimal(str(e)) for e in [ 0, 0.4, 0.75, 1.1, 3. ] ])
+edge_tolerance = 1e-9 # default max. distance of coinciding bin edges
+integral_index_cache_size = 64 # max. number of memoized integral indices
+
+class Edges(np.ndarray):
+  """float64 array of bin edges with coincidence tolerance
+
+  edges closer than tol (default: edge_tolerance) are considered coinciding
+  when matching bin edges of different binnings (see getCocktailSums)
+  """
+  def __new__(cls, edges, tol = None):
+    obj = np.asarray(edges, dtype=float).view(cls)
+    obj.tol = edge_tolerance if tol is None else tol
+    return obj
+
+  def __array_finalize__(self, obj):
+    self.tol = getattr(obj, 'tol', edge_tolerance)
+
+eRanges = Edges([ 0, 0.4, 0.75, 1.1, 3. ])
+# lower & upper LMR edges for window-choice syst. study
+eRangesSystLMR = [ Edges(0.15 + 0.05*np.arange(6)), Edges(0.5 + 0.05*np.arange(6)) ]
+
+def getModuleDirs(module_url):
+  """get input/output dirs of a module (same layout as for package)
+
+  e.g. ccsgp_get_started/examples/gp_stack.py ->
+  data/examples/gp_stack/input & output/examples/gp_stack
+  """
+  modurl = os.path.splitext(os.path.relpath(module_url))[0]
+  # split module url & replace package name
+  dirs = modurl.split(os.sep)
+  dirs[0] = 'data' # TODO de-hardcode
+  return os.path.join(*(dirs + ['input'])), os.path.join(*(['output'] + dirs[1:]))
 
 def getWorkDirs():
   """get input/output dirs (same input/output layout as for package)"""
   # get caller module
-  caller_fullurl = inspect.stack()[1][1]
-  caller_relurl = os.path.relpath(caller_fullurl)
-  caller_modurl = os.path.splitext(caller_relurl)[0]
-  # split caller_url & append 'Dir' to package name
-  dirs = caller_modurl.split('/')
-  dirs[0] = 'data' # TODO de-hardcode
-  # get, check and create outdir
-  outDir = os.path.join(*(['output'] + dirs[1:]))
-  if not os.path.exists(outDir): os.makedirs(outDir)
-  # get and check indir
-  dirs.append('input')
-  inDir = os.path.join(*dirs)
+  inDir, outDir = getModuleDirs(inspect.stack()[1][1])
+  # create outdir
+  try: os.makedirs(outDir)
+  except OSError as e: # created by a concurrent job
+    if e.errno != errno.EEXIST: raise
+  # check indir
   if not os.path.exists(inDir):
     logging.critical('create input dir %s to continue!' % inDir)
     sys.exit(1)
   return inDir, outDir
 
+npyCacheDir = os.path.join('output', '.npycache') # sidecars of parsed inputs
+
+def loadDatFile(file_url, **kwargs):
+  """load text data file via numpy.loadtxt, parsing it only once
+
+  - parsed array is stored as .npy sidecar in npyCacheDir, keyed by absolute
+    path, size and mtime of the input file (and the loadtxt kwargs)
+  - sidecars of older versions of the input file are removed when a new
+    one is written, i.e. there's one sidecar per input file (and kwargs)
+  - subsequent calls return copy-on-write memory-mapped arrays, i.e. in-place
+    modifications don't touch the sidecar
+  """
+  file_url = os.path.abspath(file_url)
+  st = os.stat(file_url)
+  source = hashlib.sha1(repr((file_url, sorted(kwargs.items())))).hexdigest()
+  key = hashlib.sha1(repr((source, st.st_size, st.st_mtime))).hexdigest()
+  prefix = '%s.%s.' % (os.path.basename(file_url), source[:12])
+  npy_url = os.path.join(npyCacheDir, '%s%s.npy' % (prefix, key[:16]))
+  if not os.path.exists(npy_url):
+    data = np.loadtxt(open(file_url, 'rb'), **kwargs)
+    if not data.size: return data # can't memory-map empty arrays
+    try: os.makedirs(npyCacheDir)
+    except OSError: pass # already exists
+    # write to temp. file & rename to be safe for concurrent runs
+    fd, tmp_url = tempfile.mkstemp(suffix = '.npy', dir = npyCacheDir)
+    with os.fdopen(fd, 'wb') as f: np.save(f, data)
+    os.rename(tmp_url, npy_url)
+    logging.debug('cached %s as %s' % (file_url, npy_url))
+    for fn in os.listdir(npyCacheDir): # stale sidecars of the same input
+      if not fn.startswith(prefix) or fn == os.path.basename(npy_url): continue
+      try: os.remove(os.path.join(npyCacheDir, fn))
+      except OSError: pass # removed concurrently
+    return data
+  return np.load(npy_url, mmap_mode = 'c').view(np.ndarray)
+
+def parseInputFilename(filename):
+  """get energy and data type (or particle) from input file name (data19.dat)"""
+  energy = re.compile('\d+').search(filename).group()
+  return energy, re.sub('%s\.dat' % energy, '', filename)
+
+def _inputSubdirs(inDir):
+  return [ '' ] + [
+    d for d in os.listdir(inDir) if os.path.isdir(os.path.join(inDir, d))
+  ]
+
+def _listInputFiles(inDir):
+  """(subdir, filename, size, mtime) of all files in inDir & its subdirs"""
+  files = []
+  for subdir in _inputSubdirs(inDir):
+    for filename in os.listdir(os.path.join(inDir, subdir)):
+      file_url = os.path.join(inDir, subdir, filename)
+      if os.path.isdir(file_url): continue
+      st = os.stat(file_url)
+      files.append((subdir, filename, st.st_size, st.st_mtime))
+  return files
+
+def buildVersionBundle(inDir, bundle_url = None):
+  """pack all input files of a data version into a single version bundle
+
+  - bundle is an uncompressed npz file (default: <inDir>.npz) with one array
+    per input file and a json manifest mapping each (sub)directory to its
+    list of [filename, energy, data_type, array name, size, mtime]
+  - files are listed in os.listdir order (same order as reading inDir)
+  - size & mtime of each file are recorded to detect outdated bundles (see
+    VersionInput)
+  """
+  if bundle_url is None: bundle_url = inDir.rstrip(os.sep) + '.npz'
+  arrays = {}
+  manifest = dict((subdir, []) for subdir in _inputSubdirs(inDir))
+  for subdir, filename, size, mtime in _listInputFiles(inDir):
+    key = 'a%d' % len(arrays)
+    arrays[key] = np.loadtxt(open(os.path.join(inDir, subdir, filename), 'rb'))
+    manifest[subdir].append([ filename ] + list(
+      parseInputFilename(filename)
+    ) + [ key, size, mtime ])
+  np.savez(bundle_url, manifest = np.array(json.dumps(manifest)), **arrays)
+  logging.info('packed %d files of %s into %s' % (
+    len(arrays), inDir, bundle_url
+  ))
+  return bundle_url
+
+class VersionInput(object):
+  """input files of a data version, read from version bundle or directory
+
+  - the version bundle <inDir>.npz (see buildVersionBundle) is used if it
+    exists, otherwise the files in inDir (via loadDatFile)
+  - if inDir exists as well, the bundle is only used if it matches the
+    files in inDir (names, sizes & mtimes), otherwise a warning is logged
+    and inDir is read instead
+  - bundle arrays are only read on access (one open)
+  """
+  def __init__(self, inDir):
+    self.inDir = inDir.rstrip(os.sep)
+    bundle_url = self.inDir + '.npz'
+    self.bundle = np.load(bundle_url) if os.path.exists(bundle_url) else None
+    if self.bundle is not None:
+      self.manifest = json.loads(str(self.bundle['manifest']))
+      if os.path.isdir(self.inDir) and not self._bundleUpToDate():
+        logging.warning('%s outdated, reading %s (rebuild w/ --bundle)' % (
+          bundle_url, self.inDir
+        ))
+        self.bundle = None
+    if self.bundle is not None:
+      self.keys = dict(
+        ((subdir, e[0]), e[3]) for subdir, entries in self.manifest.iteritems()
+        for e in entries
+      )
+
+  def _bundleUpToDate(self):
+    # bundles w/o recorded sizes & mtimes can't be checked
+    bundled = set(
+      (subdir, e[0], e[4], e[5]) if len(e) > 5 else None
+      for subdir, entries in self.manifest.iteritems() for e in entries
+    )
+    return bundled == set(_listInputFiles(self.inDir))
+
+  def subdirs(self):
+    """list of subdirectories (e.g. cocktail_contribs)"""
+    if self.bundle is not None:
+      return [ str(d) for d in self.manifest if d ]
+    return _inputSubdirs(self.inDir)[1:]
+
+  def entries(self, subdir = ''):
+    """list of (filename, energy, data_type) for all files in subdir"""
+    if self.bundle is not None:
+      return [ tuple(str(v) for v in e[:3]) for e in self.manifest[subdir] ]
+    dirname = os.path.join(self.inDir, subdir)
+    return [
+      (fn,) + parseInputFilename(fn) for fn in os.listdir(dirname)
+      if not os.path.isdir(os.path.join(dirname, fn))
+    ]
+
+  def load(self, filename, subdir = ''):
+    """get data array of input file"""
+    if self.bundle is not None: return self.bundle[self.keys[subdir, filename]]
+    return loadDatFile(os.path.join(self.inDir, subdir, filename))
+
+class UArray(object):
+  """columnar array of values with separate stat. and syst. uncertainties
+
+  - nominal values, stat. and syst. errors are kept as numpy columns
+  - +, -, *, / and sum() are vectorized and propagate stat. and syst. errors
+    separately to first order (like the uncertainties package)
+  - operands are treated as uncorrelated which holds for all data, cocktail
+    and model combinations in the examples (no bin is combined with itself)
+  - indexing with an integer returns a 0-d UArray (single value)
+  """
+  __array_priority__ = 1000 # numpy scalars/arrays defer to UArray operators
+  __array_ufunc__ = None
+
+  def __init__(self, nominal, stat = 0., syst = 0.):
+    self.nominal = np.asarray(nominal, dtype=float)
+    zeros = np.zeros(self.nominal.shape)
+    self.stat = np.abs(np.asarray(stat, dtype=float)) + zeros
+    self.syst = np.abs(np.asarray(syst, dtype=float)) + zeros
+
+  @property
+  def nominal_value(self): return self._item(self.nominal)
+
+  @property
+  def std_dev(self): return self._item(np.hypot(self.stat, self.syst))
+
+  def _item(self, arr): return float(arr) if arr.ndim == 0 else arr
+
+  def __len__(self): return len(self.nominal)
+
+  def __getitem__(self, key):
+    return UArray(self.nominal[key], self.stat[key], self.syst[key])
+
+  def __iter__(self):
+    for i in xrange(len(self)): yield self[i]
+
+  def __repr__(self):
+    return 'UArray(%r, stat=%r, syst=%r)' % (
+      self._item(self.nominal), self._item(self.stat), self._item(self.syst)
+    )
+
+  def __neg__(self): return UArray(-self.nominal, self.stat, self.syst)
+
+  def __add__(self, other):
+    o = asUArray(other)
+    return UArray(
+      self.nominal + o.nominal,
+      np.hypot(self.stat, o.stat), np.hypot(self.syst, o.syst)
+    )
+  __radd__ = __add__
+
+  def __sub__(self, other): return self + (-asUArray(other))
+
+  def __rsub__(self, other): return asUArray(other) - self
+
+  def __mul__(self, other):
+    o = asUArray(other)
+    return UArray(
+      self.nominal * o.nominal,
+      np.hypot(self.stat * o.nominal, o.stat * self.nominal),
+      np.hypot(self.syst * o.nominal, o.syst * self.nominal)
+    )
+  __rmul__ = __mul__
+
+  def __truediv__(self, other):
+    o = asUArray(other)
+    nominal = self.nominal / o.nominal
+    denom = np.abs(o.nominal)
+    return UArray(
+      nominal, np.hypot(self.stat, nominal * o.stat) / denom,
+      np.hypot(self.syst, nominal * o.syst) / denom
+    )
+  __div__ = __truediv__
+
+  def __rtruediv__(self, other): return asUArray(other) / self
+  __rdiv__ = __rtruediv__
+
+  def sum(self):
+    """sum of all values, errors added in quadrature"""
+    return UArray(
+      self.nominal.sum(), math.sqrt(np.sum(self.stat**2)),
+      math.sqrt(np.sum(self.syst**2))
+    )
+
+def asUArray(x):
+  """convert x to UArray (w/o uncertainties if x isn't a UArray already)"""
+  return x if isinstance(x, UArray) else UArray(x)
+
 def getUArray(npArr):
   """uncertainty array multiplied by binwidth (col2 = dx)"""
-  ufloats = []
-  for dp in npArr:
-      u = ufloat(dp[1], abs(dp[3]), 'stat')
-      v = ufloat(dp[1], abs(dp[4]), 'syst')
-      r = (u+v)/2.*dp[2]*2.
-      ufloats.append(r)
-      # NOTE: center value ok, but both error contribs half!
-      # see getErrorComponent()
-  return np.array(ufloats)
+  binwidth = 2. * npArr[:,2]
+  return UArray(
+    npArr[:,1] * binwidth, npArr[:,3] * binwidth, npArr[:,4] * binwidth
+  )
 
 def getErrorComponent(result, tag):
-    """get total error contribution for component with specific tag"""
-    return math.sqrt(sum(
-        (error*2)**2
-        for (var, error) in result.error_components().items()
-        if var.tag == tag
-    ))
-
-def getEdges(npArr):
-  """get np array of bin edges"""
-  edges = np.concatenate(([0], npArr[:,0] + npArr[:,2]))
-  return np.array([Decimal(str(i)) for i in edges])
-
-def getMaskIndices(mask):
-  """get lower and upper index of mask"""
-  return [
-    list(mask).index(True), len(mask) - 1 - list(mask)[::-1].index(True)
-  ]
+    """get total error contribution for component with tag stat or syst"""
+    result = asUArray(result)
+    return result._item(getattr(result, tag))
+
+def getDataPoint(x, result, dx = 0.):
+  """get data point [x, y, dx, stat, syst] for result (UArray)
+
+  returns a list for single values and an array of data points otherwise
+  """
+  result = asUArray(result)
+  dp = np.broadcast_arrays(x, result.nominal, dx, result.stat, result.syst)
+  if result.nominal.ndim == 0: return [ float(v) for v in dp ]
+  return np.column_stack(dp)
+
+def getEdges(npArr, tol = None):
+  """get array of bin edges (see Edges)"""
+  return Edges(np.concatenate(([0], npArr[:,0] + npArr[:,2])), tol)
 
 def enumzipEdges(eArr):
   """zip and enumerate edges into pairs of lower and upper limits"""
   return enumerate(zip(eArr[:-1], eArr[1:]))
 
+class IntegralIndex(object):
+  """cumulative-integral index of a spectrum for arbitrary mass range sums
+
+  - built once per spectrum from its bin edges and UArray (getIntegralIndex)
+  - sums() answers yield and stat./syst. uncertainty for many mass ranges at
+    once with partial-bin corrections, each range in logarithmic time
+  - save() and loadIntegralIndex() persist the index as numpy .npz file
+  - sums() results are memoized per set of mass ranges (read-only arrays)
+  """
+  _keys = [ 'nominal', 'stat', 'syst' ]
+
+  def __init__(self, edges, uarr, cumsums = None):
+    self.edges = edges if isinstance(edges, Edges) else Edges(edges)
+    self.uarr = uarr
+    # nominal values and variances
+    self.columns = [ uarr.nominal, uarr.stat**2, uarr.syst**2 ]
+    # cumulative sums from below and from above, and of absolute values
+    self.cumsums = cumsums if cumsums is not None else [
+      np.vstack((
+        getCumSum(c), getCumSum(c[::-1])[::-1], getCumSum(np.abs(c))
+      )) for c in self.columns
+    ]
+    self._sums = {}
+
+  def _rangeSums(self, j, first, last):
+    # sums of column j in bins [first[i], last[i]) from the cumulative sum
+    # accumulating less (keeps small sums in the spectrum tails precise)
+    below, above, cumabs = self.cumsums[j]
+    fromBelow = (cumabs[last] <= cumabs[-1] - cumabs[first])
+    return np.where(
+      fromBelow, below[last] - below[first], above[first] - above[last]
+    )
+
+  def sums(self, e0, e1):
+    """get the sums for all mass ranges [e0[i], e1[i]] (see getCocktailSums)"""
+    f0, f1 = [ np.atleast_1d(np.asarray(e, dtype=float)) for e in [e0, e1] ]
+    key = tuple((f.shape, np.ascontiguousarray(f).tostring()) for f in [f0, f1])
+    if key not in self._sums: self._sums[key] = self._calcSums(f0, f1)
+    return UArray(*self._sums[key])
+
+  def _calcSums(self, f0, f1):
+    # nominal, stat. and syst. sums for mass ranges [f0[i], f1[i]]
+    tol, nbins = self.edges.tol, len(self.edges) - 1
+    fC = np.asarray(self.edges, dtype=float)
+    # first edge >= e0 and last edge <= e1 (within tol)
+    low = np.searchsorted(fC, f0 - tol, 'left')
+    upp = np.searchsorted(fC, f1 + tol, 'right') - 1
+    # mass range wider than single bin
+    wide = (low <= upp)
+    # sum of full bins in mass range (always w/o last bin)
+    first = np.where(wide, low, 0)
+    last = np.where(wide, np.maximum(np.minimum(upp, nbins-1), low), 0)
+    sums = [
+      np.where(wide, self._rangeSums(j, first, last), 0.)
+      for j in xrange(len(self.columns))
+    ]
+    def addPartialBin(mask, idx, frac):
+      # add fraction frac of bin idx where mask is set
+      idx = np.clip(idx, 0, nbins-1)
+      frac = np.where(mask, frac, 0.)
+      for j, c in enumerate(self.columns):
+        sums[j] += c[idx] * (frac if j == 0 else frac**2)
+    edge = lambda idx: np.clip(idx, 0, nbins)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      # correction for non-coinciding lower edge
+      mask = wide & (low > 0) & (np.abs(fC[edge(low)] - f0) > tol)
+      addPartialBin(mask, low-1, (
+        (fC[edge(low)] - f0) / (fC[edge(low)] - fC[edge(low-1)])
+      ))
+      # correction for non-coinciding upper edge (none at last edge)
+      mask = wide & (upp < nbins) & (np.abs(fC[edge(upp)] - f1) > tol)
+      addPartialBin(mask, upp, (
+        (f1 - fC[edge(upp)]) / (fC[edge(upp+1)] - fC[edge(upp)])
+      ))
+      # mass range within single bin
+      # NOTE: uses the bin above the mass range unless in last bin
+      idx = np.where(low == nbins, nbins-1, low)
+      addPartialBin(~wide & (low <= nbins), idx, (
+        (f1 - f0) / (fC[edge(idx+1)] - fC[edge(idx)])
+      ))
+    sums[1:] = [ np.sqrt(np.maximum(v, 0.)) for v in sums[1:] ]
+    for v in sums: v.setflags(write = False) # shared by all callers
+    return sums
+
+  def save(self, file_url):
+    """save index to numpy .npz file"""
+    arrays = dict(
+      ('cumsums_%s' % k, cs) for k, cs in zip(self._keys, self.cumsums)
+    )
+    arrays.update((k, getattr(self.uarr, k)) for k in self._keys)
+    np.savez(file_url, edges = self.edges, tol = self.edges.tol, **arrays)
+
+def getCumSum(arr):
+  """get cumulative sums of arr starting at zero (len(arr)+1 entries)"""
+  return np.concatenate(([0.], np.cumsum(arr)))
+
+_integralIndexCache = OrderedDict()
+
+def getIntegralIndex(npArr):
+  """get integral index for spectrum in numpy array (see IntegralIndex)
+
+  indices are memoized by array content (least recently used dropped beyond
+  integral_index_cache_size) to share them and their sums within a process
+  """
+  npArr = np.ascontiguousarray(npArr)
+  sha1 = hashlib.sha1(repr((npArr.dtype.str, npArr.shape)))
+  sha1.update(npArr.data)
+  key = sha1.hexdigest()
+  index = _integralIndexCache.pop(key, None)
+  if index is None: index = IntegralIndex(getEdges(npArr), getUArray(npArr))
+  _integralIndexCache[key] = index
+  while len(_integralIndexCache) > integral_index_cache_size:
+    _integralIndexCache.popitem(last = False)
+  return index
+
+def clearIntegralIndexCache():
+  """drop all memoized integral indices (see getIntegralIndex)"""
+  _integralIndexCache.clear()
+
+def loadIntegralIndex(file_url):
+  """load integral index saved via IntegralIndex.save()"""
+  f = np.load(file_url)
+  return IntegralIndex(
+    Edges(f['edges'], float(f['tol'])),
+    UArray(*[ f[k] for k in IntegralIndex._keys ]),
+    [ f['cumsums_%s' % k] for k in IntegralIndex._keys ]
+  )
+
+def getCocktailSums(e0, e1, eCocktail, uCocktail):
+  """get the cocktail sums for all data bin ranges [e0[i], e1[i]] at once
+
+  - sums over full cocktail bins from cumulative sums (always w/o last bin)
+  - bin indices of all data bin edges via np.searchsorted
+  - corrections for partially covered cocktail bins at non-coinciding edges
+  - data bin ranges starting above the last cocktail edge give zero
+  """
+  return IntegralIndex(eCocktail, uCocktail).sums(e0, e1)
+
 def getCocktailSum(e0, e1, eCocktail, uCocktail):
-  """get the cocktail sum for a given data bin range"""
-  # get mask and according indices
-  mask = (eCocktail >= e0) & (eCocktail <= e1)
-  # data bin range wider than single cocktail bin
-  if np.any(mask):
-    idx = getMaskIndices(mask)
-    # determine coinciding flags
-    eCl, eCu = eCocktail[idx[0]], eCocktail[idx[1]]
-    not_coinc_low, not_coinc_upp = (eCl != e0), (eCu != e1)
-    # get cocktail sum in data bin (always w/o last bin)
-    uCocktailSum = fsum(uCocktail[mask[:-1]][:-1])
-    logging.debug('    sum: {}'.format(uCocktailSum))
-    # get correction for non-coinciding edges
-    if not_coinc_low:
-      eCl_bw = eCl - eCocktail[idx[0]-1]
-      corr_low = (eCl - e0) / eCl_bw
-      abs_corr_low = float(corr_low) * uCocktail[idx[0]-1]
-      uCocktailSum += abs_corr_low
-      logging.debug(('    low: %g == %g -> %g (%g) -> %g -> {} -> {}' % (
-        e0, eCl, eCl - e0, eCl_bw, corr_low
-      )).format(abs_corr_low, uCocktailSum))
-    if not_coinc_upp:
-      if idx[1]+1 < len(eCocktail):
-        eCu_bw = eCocktail[idx[1]+1] - eCu
-        corr_upp = (e1 - eCu) / eCu_bw
-        abs_corr_upp = float(corr_upp) * uCocktail[idx[1]]
-      else:# catch last index (quick fix!)
-        abs_corr_upp = eCu_bw = corr_upp = 0
-      uCocktailSum += abs_corr_upp
-      logging.debug(('    upp: %g == %g -> %g (%g) -> %g -> {} -> {}' % (
-        e1, eCu, e1 - eCu, eCu_bw, corr_upp
-      )).format(abs_corr_upp, uCocktailSum))
-  else:
-    mask = (eCocktail >= e0)
-    idx = getMaskIndices(mask) # only use first index
-    # catch if already at last index
-    if idx[0] == idx[1] and idx[0] == len(eCocktail)-1:
-      corr = (e1 - e0) / (eCocktail[idx[0]] - eCocktail[idx[0]-1])
-      uCocktailSum = float(corr) * uCocktail[idx[0]-1]
-    else: # default case
-      corr = (e1 - e0) / (eCocktail[idx[0]+1] - eCocktail[idx[0]])
-      uCocktailSum = float(corr) * uCocktail[idx[0]]
-    logging.debug('    sum: {}'.format(uCocktailSum))
-  return uCocktailSum
+  """get the cocktail sum for a given data bin range (see getCocktailSums)"""
+  return getCocktailSums([e0], [e1], eCocktail, uCocktail)[0]
+
+def getMassRangesScan(indata, lowerEdges, upperEdges):
+  """get sums for all mass ranges [lowerEdges[i], upperEdges[j]] at once
+
+  returns a UArray of shape (len(lowerEdges), len(upperEdges)) with NaN for
+  invalid mass ranges (lower edge >= upper edge)
+  """
+  if not isinstance(indata, IntegralIndex): indata = getIntegralIndex(indata)
+  low, upp = np.meshgrid(lowerEdges, upperEdges, indexing = 'ij')
+  sums = indata.sums(low.ravel(), upp.ravel())
+  invalid = (low >= upp).ravel()
+  return UArray(*[
+    np.where(invalid, np.nan, getattr(sums, k)).reshape(low.shape)
+    for k in [ 'nominal', 'stat', 'syst' ]
+  ])
 
 def getMassRangesSums(
   indata,  suffix = "", customRanges = None,
   onlyLMR = False, systLMR = False, singleRange = False
 ):
-  eRangesSyst = [ eRanges if customRanges is None else customRanges ]
-  if systLMR:
-    step_size, nsteps, rangeOffsetsLMR = 0.05, 6, [0.15, 0.5]
-    eEdgesSyst = [ [ # all lower & upper edges for LMR syst. study
-      Decimal(str(rangeOffsetsLMR[j]+i*step_size))
-      for i in xrange(nsteps)
-    ] for j in xrange(2) ]
-    # all combos of lower and upper LMR edges
-    eRangesSyst = [ [ le, ue ] for ue in eEdgesSyst[1] for le in eEdgesSyst[0] ]
-    onlyLMR = False # flag meaningless in this case
-  uInData = getUArray(indata)
-  eInData = getEdges(indata)
+  # indata: numpy array or its IntegralIndex (to reuse for multiple calls)
+  if not isinstance(indata, IntegralIndex): indata = getIntegralIndex(indata)
+  if systLMR: # all combos of lower and upper LMR edges
+    uScan = getMassRangesScan(indata, *eRangesSystLMR)
+    return dict(
+      ('%s%s_%g-%g' % (mass_titles[1], suffix, e0, e1), uScan[i,j])
+      for i, e0 in enumerate(eRangesSystLMR[0])
+      for j, e1 in enumerate(eRangesSystLMR[1])
+    )
+  # collect all requested mass ranges and sum them in one pass
+  ranges = [
+    (i, e0, e1) for i, (e0, e1) in enumzipEdges(
+      eRanges if customRanges is None else customRanges
+    ) if not onlyLMR or i == 1
+  ]
+  idx, e0, e1 = [ np.array(l) for l in zip(*ranges) ]
+  uRangesSums = indata.sums(e0, e1)
+  if onlyLMR or singleRange: return uRangesSums[0]
   uSums = {}
-  for erngs in eRangesSyst:
-    for i, (e0, e1) in enumzipEdges(erngs):
-      if onlyLMR and i != 1: continue
-      uSum = getCocktailSum(e0, e1, eInData, uInData)
-      if (not systLMR) and (onlyLMR or singleRange): return uSum
-      logging.debug('%g - %g: %r' % (e0, e1, uSum))
-      key = mass_titles[1 if systLMR else i] + suffix
-      if systLMR: key += '_%s-%s' % (e0,e1)
-      uSums[key] = uSum
+  for j, i in enumerate(idx):
+    logging.debug('%g - %g: %r' % (e0[j], e1[j], uRangesSums[j]))
+    uSums[mass_titles[i] + suffix] = uRangesSums[j]
   return uSums
 
 def getEnergy4Key(energy):
@@ -0,0 +1,113 @@
+"""regression tests for the batched fits (examples.fitting)"""
+import unittest
+import numpy as np
+from ccsgp_get_started.examples.fitting import fitLinear, fitExp
+from ccsgp_get_started.examples.fitting import evalLinear, evalExp
+
+# Pearson's data w/ York's weights, solution from York et al. (2004) and
+# Cantrell (2008): slope -0.4805333, intercept 5.4799101, S = 11.8663
+pearsonYork = dict(
+  x = np.array([0.0, 0.9, 1.8, 2.6, 3.3, 4.4, 5.2, 6.1, 6.5, 7.4]),
+  y = np.array([5.9, 5.4, 4.4, 4.6, 3.5, 3.7, 2.8, 2.8, 2.4, 1.5]),
+  wx = np.array([1000., 1000., 500., 800., 200., 80., 60., 20., 1.8, 1.]),
+  wy = np.array([1., 1.8, 4., 8., 20., 20., 70., 70., 100., 500.])
+)
+
+def chi2Exp(p, x, y, dy):
+  return (((y - evalExp(p, x)) / dy)**2).sum()
+
+class TestFitLinear(unittest.TestCase):
+  def setUp(self):
+    rs = np.random.RandomState(7)
+    self.x = np.linspace(0., 10., 20)
+    self.dy = rs.uniform(0.5, 2., 20)
+    self.y = 1.5*self.x - 3. + rs.normal(0., self.dy)
+
+  def test_exact_line(self):
+    params, cov, chi2 = fitLinear(self.x, 1.5*self.x - 3.)
+    np.testing.assert_allclose(params, [1.5, -3.], atol = 1e-12)
+    self.assertAlmostEqual(chi2, 0.)
+
+  def test_weighted_vs_normal_equations(self):
+    params, cov, chi2 = fitLinear(self.x, self.y, dy = self.dy)
+    A = np.column_stack((self.x, np.ones_like(self.x))) / self.dy[:,None]
+    refCov = np.linalg.inv(A.T.dot(A))
+    refParams = refCov.dot(A.T.dot(self.y / self.dy))
+    np.testing.assert_allclose(params, refParams, rtol = 1e-10)
+    np.testing.assert_allclose(cov, refCov, rtol = 1e-10)
+    self.assertAlmostEqual(
+      chi2, (((self.y - evalLinear(refParams, self.x)) / self.dy)**2).sum()
+    )
+
+  def test_york(self):
+    d = pearsonYork
+    params, cov, chi2 = fitLinear(
+      d['x'], d['y'], 1./np.sqrt(d['wx']), 1./np.sqrt(d['wy'])
+    )
+    np.testing.assert_allclose(params, [-0.4805333, 5.4799101], rtol = 1e-6)
+    self.assertAlmostEqual(chi2, 11.8663, delta = 1e-4)
+
+  def test_batched_with_padding(self):
+    n = [20, 15, 8]
+    x, y, dy = [ np.full((3, 20), np.nan) for i in xrange(3) ]
+    for i, k in enumerate(n):
+      x[i,:k], y[i,:k], dy[i,:k] = self.x[:k], self.y[:k] * (i+1), self.dy[:k]
+    params, cov, chi2 = fitLinear(x, y, dy = dy)
+    self.assertEqual(params.shape, (3, 2))
+    self.assertEqual(cov.shape, (3, 2, 2))
+    for i, k in enumerate(n):
+      p, c, ch = fitLinear(self.x[:k], self.y[:k] * (i+1), dy = self.dy[:k])
+      np.testing.assert_allclose(params[i], p, rtol = 1e-10)
+      np.testing.assert_allclose(chi2[i], ch, rtol = 1e-10)
+
+  def test_invalid_errors(self):
+    for bad in [ 0., -1., np.nan, np.inf ]:
+      dy = self.dy.copy()
+      dy[3] = bad
+      self.assertRaises(ValueError, fitLinear, self.x, self.y, None, dy)
+
+class TestFitExp(unittest.TestCase):
+  def setUp(self):
+    rs = np.random.RandomState(11)
+    self.x = np.linspace(0.5, 3., 15)
+    self.dy = 0.05 * np.exp(-1.2*self.x + 2.)
+    self.y = np.exp(-1.2*self.x + 2.) + rs.normal(0., self.dy)
+
+  def test_exact(self):
+    params = fitExp(self.x, np.exp(-1.2*self.x + 2.))[0]
+    np.testing.assert_allclose(params, [1.2, 2.], rtol = 1e-8)
+
+  def test_chi2_minimum(self):
+    params, cov, chi2 = fitExp(self.x, self.y, dy = self.dy)
+    self.assertAlmostEqual(chi2, chi2Exp(params, self.x, self.y, self.dy))
+    # no step along the parameter axes lowers chi2
+    for i in xrange(2):
+      for step in [ -1e-5, 1e-5 ]:
+        p = params.copy()
+        p[i] += step
+        self.assertGreaterEqual(
+          chi2Exp(p, self.x, self.y, self.dy), chi2 * (1. - 1e-12)
+        )
+    # covariance = inverse of Hessian/2 of chi2 (absolute errors)
+    h, H = 1e-4, np.zeros((2, 2))
+    for i in xrange(2):
+      for j in xrange(2):
+        def f(si, sj):
+          p = params.copy()
+          p[i] += si*h
+          p[j] += sj*h
+          return chi2Exp(p, self.x, self.y, self.dy)
+        H[i,j] = (f(1,1) - f(1,-1) - f(-1,1) + f(-1,-1)) / (4*h*h)
+    np.testing.assert_allclose(cov, np.linalg.inv(H/2.), rtol = 0.05)
+
+  def test_batched(self):
+    y = np.vstack((self.y, 2.*self.y))
+    params = fitExp(self.x, y, dy = np.vstack((self.dy, 2.*self.dy)))[0]
+    single = fitExp(self.x, self.y, dy = self.dy)[0]
+    np.testing.assert_allclose(params[0], single, rtol = 1e-6)
+    np.testing.assert_allclose(
+      params[1], single + [0., np.log(2.)], rtol = 1e-6
+    )
+
+if __name__ == '__main__':
+  unittest.main()
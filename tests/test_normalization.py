@@ -0,0 +1,93 @@
+"""regression tests for the cached scale factors (examples.normalization)"""
+import os, shutil, tempfile, unittest
+import numpy as np
+from ccsgp_get_started.examples import normalization, utils
+from ccsgp_get_started.examples.utils import getMassRangesSums
+
+def writeSpectrum(file_url, rs, scale = 1., nbins = 40):
+  """spectrum [x, y, dx, stat, syst] in 5 MeV bins starting at 0"""
+  x = 0.0025 + 0.005*np.arange(nbins)
+  np.savetxt(file_url, np.column_stack((
+    x, scale * rs.uniform(1., 10., nbins), np.full(nbins, 0.0025),
+    rs.uniform(0.01, 0.5, nbins), rs.uniform(0.01, 0.5, nbins)
+  )))
+
+class TestScaleFactors(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.saved = (
+      normalization.normInputDir, normalization.normCacheDir,
+      normalization.calcScaleFactors, utils.npyCacheDir
+    )
+    normalization.normInputDir = os.path.join(self.tmpDir, 'input')
+    normalization.normCacheDir = os.path.join(self.tmpDir, 'normcache')
+    utils.npyCacheDir = os.path.join(self.tmpDir, 'npycache')
+    self.inDir = os.path.join(normalization.normInputDir, 'Test')
+    os.makedirs(self.inDir)
+    rs = np.random.RandomState(3)
+    for energy in ['19', '200']:
+      for data_type, scale in [('data', 1.), ('cocktail', 2.)]:
+        writeSpectrum(
+          os.path.join(self.inDir, '%s%s.dat' % (data_type, energy)), rs, scale
+        )
+
+  def tearDown(self):
+    normalization.normInputDir, normalization.normCacheDir, \
+        normalization.calcScaleFactors, utils.npyCacheDir = self.saved
+    shutil.rmtree(self.tmpDir)
+
+  def sums(self, filename):
+    return getMassRangesSums(
+      utils.loadDatFile(os.path.join(self.inDir, filename)),
+      customRanges = normalization.cRanges, singleRange = True
+    )
+
+  def test_cocktail_data_ratio(self):
+    factors = normalization.getScaleFactors('Test')
+    self.assertEqual(sorted(factors), ['19', '200'])
+    for energy, factor in factors.iteritems():
+      z = self.sums('cocktail%s.dat' % energy) / self.sums('data%s.dat' % energy)
+      self.assertAlmostEqual(factor.nominal_value, float(z.nominal))
+      self.assertAlmostEqual(
+        factor.std_dev, float(np.hypot(z.stat, z.syst))
+      )
+
+  def test_cached(self):
+    factors = normalization.getScaleFactors('Test')
+    def fail(version): raise AssertionError('scale factors recalculated')
+    normalization.calcScaleFactors = fail
+    cached = normalization.getScaleFactors('Test')
+    for energy, factor in factors.iteritems():
+      self.assertAlmostEqual(cached[energy].nominal_value, factor.nominal_value)
+      self.assertAlmostEqual(cached[energy].std_dev, factor.std_dev)
+
+  def test_input_change_invalidates_cache(self):
+    factor = normalization.getScaleFactors('Test')['19'].nominal_value
+    writeSpectrum(
+      os.path.join(self.inDir, 'cocktail19.dat'), np.random.RandomState(3),
+      4., nbins = 41 # different size: new key even w/ coarse mtimes
+    )
+    calls = []
+    calc = normalization.calcScaleFactors
+    normalization.calcScaleFactors = lambda v: calls.append(v) or calc(v)
+    changed = normalization.getScaleFactors('Test')['19'].nominal_value
+    self.assertEqual(calls, ['Test'])
+    self.assertNotAlmostEqual(changed, factor)
+    self.assertAlmostEqual(
+      changed, float((self.sums('cocktail19.dat') / self.sums('data19.dat')).nominal)
+    )
+
+  def test_missing_input(self):
+    with self.assertRaises(SystemExit):
+      normalization.getScaleFactors('Missing')
+    self.assertFalse(os.path.exists(normalization.normCacheDir))
+
+  def test_input_dir(self):
+    # input of gp_stack, same layout as getWorkDirs
+    self.assertEqual(
+      os.path.normpath(self.saved[0]),
+      os.path.join('data', 'examples', 'gp_stack', 'input')
+    )
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,353 @@
+"""regression tests for the render pool, cache & decimation (examples.render)
+
+needs the ccsgp submodule (skipped otherwise), ccsgp itself is replaced by a
+fake recording the plots and gnuplot sessions run a fake gnuplot, i.e.
+gnuplot is only needed for the tests against real gnuplot
+"""
+import os, sys, shutil, signal, tempfile, threading, unittest
+import numpy as np
+from collections import OrderedDict
+from distutils.spawn import find_executable
+try: from ccsgp_get_started.examples import render
+except ImportError: render = None
+
+# stand-in for gnuplot: logs commands, answers print to "-"
+fakeGnuplot = """
+import os, sys
+log, printTo = open(sys.argv[1], 'a'), None
+for line in iter(sys.stdin.readline, ''):
+  cmd = line.strip()
+  log.write('%d %s\\n' % (os.getpid(), cmd))
+  log.flush()
+  if cmd.startswith('set print'): printTo = cmd[10:]
+  elif cmd.startswith('print ') and printTo == '"-"':
+    sys.stdout.write(cmd[7:-1] + '\\n' if cmd[6] == '"' else '5.4\\n')
+    sys.stdout.flush()
+"""
+
+class FakeCcsgp(object):
+  """records plots, writes <name>.pdf & <name>/ data dir like ccsgp"""
+  def __init__(self, fail = ()):
+    self.calls, self.fail, self.lock = [], fail, threading.Lock()
+
+  def _make(self, kind, kwargs):
+    with self.lock: self.calls.append((kind, kwargs))
+    name = kwargs['name']
+    if name in self.fail: raise IOError('gnuplot failed for %s' % name)
+    with open(name + '.pdf', 'w') as f: f.write('pdf of %s' % name)
+    if not os.path.isdir(name): os.makedirs(name)
+    with open(os.path.join(name, 'data0.dat'), 'w') as f: f.write('0 1')
+    return { 'name': name }
+
+  def make_plot(self, **kwargs): return self._make('plot', kwargs)
+  def make_panel(self, **kwargs): return self._make('panel', kwargs)
+
+@unittest.skipIf(render is None, 'ccsgp submodule not available')
+class TestDecimation(unittest.TestCase):
+  def setUp(self):
+    rs = np.random.RandomState(5)
+    x = np.sort(rs.uniform(0., 10., 5000))
+    self.arr = np.column_stack((
+      x, np.sin(x) + rs.normal(0., 0.1, 5000), np.zeros(5000),
+      rs.uniform(0.05, 0.2, 5000), rs.uniform(0.05, 0.2, 5000)
+    ))
+
+  def assertEndpointsAndExtrema(self, out):
+    np.testing.assert_array_equal(out[0], self.arr[0])
+    np.testing.assert_array_equal(out[-1], self.arr[-1])
+    self.assertEqual(out[:,1].max(), self.arr[:,1].max())
+    self.assertEqual(out[:,1].min(), self.arr[:,1].min())
+
+  def test_minmax(self):
+    out = render.minmaxDecimate(self.arr, 200)
+    self.assertTrue(len(out) <= 202)
+    self.assertEndpointsAndExtrema(out)
+    self.assertTrue(np.all(np.diff(out[:,0]) >= 0)) # order kept
+
+  def test_lttb(self):
+    out = render.lttb(self.arr, 200)
+    self.assertEqual(len(out), 200)
+    np.testing.assert_array_equal(out[0], self.arr[0])
+    np.testing.assert_array_equal(out[-1], self.arr[-1])
+    self.assertTrue(np.all(np.diff(out[:,0]) >= 0))
+
+  def test_small_data_sets_untouched(self):
+    for method in [ render.lttb, render.minmaxDecimate, render.mergePoints ]:
+      np.testing.assert_array_equal(method(self.arr[:50], 100), self.arr[:50])
+
+  def test_merge_points_vs_loop(self):
+    arr = self.arr[:1003].copy()
+    arr[:,2] = np.where(np.arange(len(arr)) % 7, 0.01, 0.) # some w/o dx
+    out, k = render.mergePoints(arr, 100), 11
+    self.assertEqual(len(out), int(np.ceil(len(arr) / float(k))))
+    for j, i in enumerate(xrange(0, len(arr), k)):
+      grp = arr[i:i+k]
+      self.assertAlmostEqual(out[j,1], grp[:,1].mean())
+      lo, hi = (grp[:,0] - grp[:,2]).min(), (grp[:,0] + grp[:,2]).max()
+      self.assertAlmostEqual(out[j,0], 0.5*(lo + hi))
+      self.assertAlmostEqual(out[j,2], 0.5*(hi - lo))
+      for c in [3, 4]:
+        self.assertAlmostEqual(
+          out[j,c], np.sqrt((grp[:,c]**2).sum()) / len(grp)
+        )
+
+  def test_decimate_by_style(self):
+    lines = render.decimate(self.arr, 100, 'with lines')
+    points = render.decimate(self.arr, 100, 'with points')
+    np.testing.assert_array_equal(lines, render.minmaxDecimate(self.arr, 100))
+    np.testing.assert_array_equal(points, render.mergePoints(self.arr, 100))
+
+@unittest.skipIf(render is None, 'ccsgp submodule not available')
+class TestRendering(unittest.TestCase):
+  def setUp(self):
+    self.cwd, self.tmpDir = os.getcwd(), tempfile.mkdtemp()
+    os.chdir(self.tmpDir)
+    self.saved = dict(
+      (k, getattr(render, k)) for k in [
+        'ccsgp', 'render_cache_size', 'render_workers', 'output_terminals',
+        'dry_run', '_ccsgpDigest'
+      ]
+    )
+    self.fake = render.ccsgp = FakeCcsgp()
+    render._ccsgpDigest = 'fake'
+    render.output_terminals, render.dry_run = ['pdf'], False
+    render.render_cache_size = 0
+
+  def tearDown(self):
+    try: render.closeRenderPool()
+    finally:
+      del render._pending[:]
+      for k, v in self.saved.iteritems(): setattr(render, k, v)
+      os.chdir(self.cwd)
+      shutil.rmtree(self.tmpDir)
+
+  def panels(self, n):
+    data = np.arange(10.).reshape(5, 2)
+    return OrderedDict(
+      ('p%d' % i, [[data], ['with lines'], ['d']]) for i in xrange(n)
+    )
+
+  def test_page_layout(self):
+    self.assertEqual(render.pageLayout('2x3', 6), '2x3')
+    self.assertEqual(render.pageLayout('3x3', 4), '2x3')
+    self.assertEqual(render.pageLayout('1x4', 2), '1x2')
+    self.assertEqual(render.pageLayout('2x2', 1), '1x1')
+    self.assertTrue(render.pageLayout(None, 3) is None)
+
+  def test_panel_pages(self):
+    render.make_panel(
+      name = 'grid', dpt_dict = self.panels(7), layout = '3x3',
+      panels_per_page = 4
+    )
+    calls = sorted(self.fake.calls, key = lambda c: c[1]['name'])
+    self.assertEqual(
+      [ (c[1]['name'], c[1]['layout'], c[1]['dpt_dict'].keys()) for c in calls ],
+      [ ('grid_p1', '2x3', ['p0', 'p1', 'p2', 'p3']),
+        ('grid_p2', '1x3', ['p4', 'p5', 'p6']) ]
+    )
+
+  def test_cache_hit(self):
+    render.render_cache_size = 1024**2
+    kwargs = dict(name = 'cached', data = [np.arange(6.).reshape(3, 2)])
+    first = render.make_plot(**dict(kwargs))
+    shutil.rmtree('cached')
+    os.remove('cached.pdf')
+    second = render.make_plot(**dict(kwargs))
+    self.assertEqual(len(self.fake.calls), 1) # 2nd plot from cache
+    self.assertEqual(second, first)
+    self.assertTrue(os.path.exists('cached.pdf'))
+    self.assertTrue(os.path.exists(os.path.join('cached', 'data0.dat')))
+    # different data: rendered again
+    kwargs['data'] = [np.arange(8.).reshape(4, 2)]
+    render.make_plot(**kwargs)
+    self.assertEqual(len(self.fake.calls), 2)
+
+  def test_terminals_checked_before_rendering(self):
+    self.assertRaises(
+      ValueError, render.make_plot, name = 'a', data = [], terminals = ['jpg']
+    )
+    path = os.environ['PATH']
+    os.environ['PATH'] = self.tmpDir # no pdftocairo
+    try:
+      self.assertRaisesRegexp(
+        RuntimeError, 'pdftocairo', render.make_plot, name = 'a', data = [],
+        terminals = ['pdf', 'png']
+      )
+    finally: os.environ['PATH'] = path
+    self.assertEqual(self.fake.calls, [])
+
+  def test_async_renders_and_failures(self):
+    self.fake.fail = ('bad',)
+    render.initRenderPool(2)
+    def plots():
+      with render.asyncRendering():
+        for name in ['a', 'bad', 'b']: render.make_plot(name = name, data = [])
+    self.assertRaises(RuntimeError, plots)
+    self.assertEqual(
+      sorted(c[1]['name'] for c in self.fake.calls), ['a', 'b', 'bad']
+    )
+    self.assertEqual(render._pending, [])
+
+  def test_async_errors_not_masked(self):
+    # error in the context propagates, failed renders collected at close
+    self.fake.fail = ('bad',)
+    render.initRenderPool(2)
+    def plots():
+      with render.asyncRendering():
+        render.make_plot(name = 'bad', data = [])
+        raise KeyError('caller')
+    self.assertRaises(KeyError, plots)
+    self.assertRaises(RuntimeError, render.closeRenderPool)
+
+@unittest.skipIf(render is None, 'ccsgp submodule not available')
+class TestGnuplotSessions(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.saved = dict(
+      (k, getattr(render, k)) for k in [
+        'gnuplot_command', 'reuse_sessions', 'render_workers'
+      ]
+    )
+    render.closeSessions()
+    script_url = os.path.join(self.tmpDir, 'gnuplot.py')
+    with open(script_url, 'w') as f: f.write(fakeGnuplot)
+    self.log_url = os.path.join(self.tmpDir, 'gnuplot.log')
+    render.gnuplot_command = '%s %s %s' % (
+      sys.executable, script_url, self.log_url
+    )
+    render.reuse_sessions, render.render_workers = True, 1
+
+  def tearDown(self):
+    render.closeSessions()
+    for k, v in self.saved.iteritems(): setattr(render, k, v)
+    shutil.rmtree(self.tmpDir)
+
+  def commands(self):
+    with open(self.log_url) as f:
+      return [ line.rstrip('\n').split(' ', 1) for line in f ]
+
+  def test_reuse_and_reset(self):
+    session = render.openSession()
+    session('plot x')
+    session.close()
+    session.close() # closed twice (e.g. close() & __del__ in gnuplot-py)
+    self.assertTrue(render.openSession() is session)
+    session('plot x**2')
+    session.close()
+    session.sync() # reset done
+    commands = self.commands()
+    self.assertEqual(len(set(pid for pid, cmd in commands)), 1)
+    cmds = [ cmd for pid, cmd in commands if not 'print' in cmd ]
+    self.assertEqual(cmds, [
+      'plot x', 'set output', 'reset session',
+      'plot x**2', 'set output', 'reset session'
+    ])
+
+  def test_concurrent_plots(self):
+    sessions = [ render.openSession() for i in xrange(3) ]
+    self.assertEqual(len(set(s.process.pid for s in sessions)), 3)
+    for s in sessions: s.close()
+    # render_workers + 1 kept for the next plots, others terminated
+    self.assertEqual(len(render._idleSessions), 2)
+    self.assertEqual(sum(s.alive() for s in sessions), 2)
+
+  def test_dead_session_replaced(self):
+    session = render.openSession()
+    session.close()
+    os.kill(session.process.pid, signal.SIGKILL)
+    session.process.wait()
+    self.assertFalse(render.openSession() is session)
+
+  def test_sync_on_closed_output(self):
+    session = render.openSession()
+    session('set output "a.pdf"')
+    session('plot x')
+    session('set output') # returns once gnuplot is done w/ the output
+    self.assertEqual(self.commands()[-3][1], 'set output')
+    session.close()
+
+  def test_no_reuse(self):
+    render.reuse_sessions = False
+    if render._gnuplotProcess is None: return # w/o gnuplot-py always reused
+    process = render.openSession() # gnuplot-py's GnuplotProcess
+    try: self.assertFalse(isinstance(process, render.GnuplotSession))
+    finally: process.close()
+
+  @unittest.skipIf(find_executable('gnuplot') is None, 'gnuplot not installed')
+  def test_gnuplot_state_cleared(self):
+    render.gnuplot_command = 'gnuplot'
+    session = render.openSession()
+    session('a = 1')
+    session('set xrange [2:3]')
+    session.close()
+    self.assertTrue(render.openSession() is session)
+    if session.reset == 'reset session':
+      self.assertEqual(session.query('exists("a")'), '0')
+    self.assertEqual(session.query('GPVAL_X_MIN < 2 ? 1 : 0'), '1')
+    session.close()
+
+@unittest.skipIf(render is None, 'ccsgp submodule not available')
+class TestBinaryData(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    rs = np.random.RandomState(9)
+    x = np.sort(rs.uniform(0.1, 3., 2000))
+    self.arr = np.column_stack((
+      x, np.exp(-x) * rs.uniform(0.5, 1.5, 2000), np.full(2000, 0.005),
+      rs.uniform(0.01, 0.1, 2000), rs.uniform(0.01, 0.1, 2000)
+    ))
+    self.threshold = render.binary_threshold
+
+  def tearDown(self):
+    render.binary_threshold = self.threshold
+    shutil.rmtree(self.tmpDir)
+
+  def test_write_binary(self):
+    file_url, spec = render.writeBinary(self.arr[:,:3], self.tmpDir)
+    self.assertEqual(spec, 'binary format="%3double"')
+    np.testing.assert_array_equal(
+      np.fromfile(file_url, dtype = '=f8').reshape(-1, 3), self.arr[:,:3]
+    )
+
+  @unittest.skipIf(
+    render is None or render._fileItem is None, 'gnuplot-py not available'
+  )
+  def test_binary_data_items(self):
+    render.binary_threshold = self.arr.size
+    item = render.binaryData(self.arr, using = '1:2', with_ = 'lines')
+    self.assertTrue(isinstance(item, render.BinaryFileItem))
+    self.assertTrue('binary format="%5double" using 1:2' in item.command())
+    file_url = item.file_url
+    del item
+    self.assertFalse(os.path.exists(file_url))
+    # small data sets & column lists: text via gnuplot-py's Data
+    for data in [(self.arr[:10],), (self.arr[:,0], self.arr[:,1])]:
+      self.assertFalse(isinstance(
+        render.binaryData(*data), render.BinaryFileItem
+      ))
+
+  @unittest.skipIf(find_executable('gnuplot') is None, 'gnuplot not installed')
+  def test_binary_vs_text(self):
+    # points plotted from binary & text input are the same
+    gnuplot_command, render.gnuplot_command = render.gnuplot_command, 'gnuplot'
+    try: session = render.GnuplotSession()
+    finally: render.gnuplot_command = gnuplot_command
+    text_url = os.path.join(self.tmpDir, 'data.dat')
+    np.savetxt(text_url, self.arr, fmt = '%.17g')
+    file_url, spec = render.writeBinary(self.arr, self.tmpDir)
+    tables = []
+    for source in [ '"%s"' % text_url, '"%s" %s' % (file_url, spec) ]:
+      tables.append(os.path.join(self.tmpDir, 'table%d' % len(tables)))
+      session('set table "%s"' % tables[-1])
+      session('plot %s using 1:2:4 notitle with yerrorbars' % source)
+      session('unset table')
+    session.sync()
+    session.terminate()
+    text, binary = [
+      [ l for l in open(t) if not l.startswith('#') ] for t in tables
+    ]
+    self.assertEqual(len(text), len(self.arr) + 1) # incl. blank line
+    self.assertEqual(binary, text)
+
+if __name__ == '__main__':
+  unittest.main()
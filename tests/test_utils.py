@@ -0,0 +1,249 @@
+"""regression tests for UArray and IntegralIndex (examples.utils)"""
+import os, shutil, tempfile, unittest
+import numpy as np
+from ccsgp_get_started.examples import utils
+from ccsgp_get_started.examples.utils import UArray, IntegralIndex, Edges
+from ccsgp_get_started.examples.utils import getIntegralIndex, getMassRangesScan
+from ccsgp_get_started.examples.utils import loadIntegralIndex, getUArray
+
+def bruteForceSum(edges, uarr, e0, e1):
+  """sum over bins weighted by their fraction inside [e0, e1] (one by one)"""
+  nominal, stat2, syst2 = 0., 0., 0.
+  for i in xrange(len(edges) - 1):
+    overlap = min(edges[i+1], e1) - max(edges[i], e0)
+    if overlap <= 0: continue
+    frac = overlap / (edges[i+1] - edges[i])
+    nominal += frac * uarr.nominal[i]
+    stat2 += (frac * uarr.stat[i])**2
+    syst2 += (frac * uarr.syst[i])**2
+  return nominal, np.sqrt(stat2), np.sqrt(syst2)
+
+def randomSpectrum(rs, nbins):
+  """spectrum [x, y, dx, stat, syst] w/ random bin widths"""
+  widths = rs.uniform(0.005, 0.05, nbins)
+  edges = np.concatenate(([0.], np.cumsum(widths)))
+  return np.column_stack((
+    0.5*(edges[1:] + edges[:-1]), rs.uniform(0.1, 10., nbins), 0.5*widths,
+    rs.uniform(0., 1., nbins), rs.uniform(0., 1., nbins)
+  ))
+
+class TestUArray(unittest.TestCase):
+  def setUp(self):
+    self.a = UArray([2., 4.], [0.1, 0.2], [0.3, 0.4])
+    self.b = UArray([1., 8.], [0.5, 0.1], [0.2, 0.6])
+
+  def assertUArray(self, u, nominal, stat, syst):
+    np.testing.assert_allclose(u.nominal, nominal, rtol = 1e-12)
+    np.testing.assert_allclose(u.stat, stat, rtol = 1e-12)
+    np.testing.assert_allclose(u.syst, syst, rtol = 1e-12)
+
+  def test_add_sub(self):
+    a, b = self.a, self.b
+    for u, nominal in [ (a + b, [3., 12.]), (a - b, [1., -4.]) ]:
+      self.assertUArray(
+        u, nominal, np.hypot(a.stat, b.stat), np.hypot(a.syst, b.syst)
+      )
+    self.assertUArray(1. - a, 1. - a.nominal, a.stat, a.syst)
+
+  def test_mul_div(self):
+    a, b = self.a, self.b
+    # first order: relative errors added in quadrature
+    z = a.nominal * b.nominal
+    self.assertUArray(
+      a * b, z, z * np.hypot(a.stat/a.nominal, b.stat/b.nominal),
+      z * np.hypot(a.syst/a.nominal, b.syst/b.nominal)
+    )
+    z = a.nominal / b.nominal
+    self.assertUArray(
+      a / b, z, z * np.hypot(a.stat/a.nominal, b.stat/b.nominal),
+      z * np.hypot(a.syst/a.nominal, b.syst/b.nominal)
+    )
+    self.assertUArray(2. * a, 2. * a.nominal, 2. * a.stat, 2. * a.syst)
+    self.assertUArray(
+      1. / a, 1. / a.nominal, a.stat / a.nominal**2, a.syst / a.nominal**2
+    )
+
+  def test_sum_and_items(self):
+    s = self.a.sum()
+    self.assertAlmostEqual(s.nominal_value, 6.)
+    self.assertAlmostEqual(float(s.stat), np.hypot(0.1, 0.2))
+    self.assertAlmostEqual(float(s.syst), np.hypot(0.3, 0.4))
+    self.assertEqual(self.a[1].nominal_value, 4.)
+    self.assertEqual(len(list(self.a)), 2)
+
+  def test_uncertainties_package(self):
+    try: from uncertainties import ufloat
+    except ImportError: self.skipTest('uncertainties not installed')
+    a, b = self.a[0], self.b[0]
+    ua = ufloat(a.nominal_value, a.std_dev)
+    ub = ufloat(b.nominal_value, b.std_dev)
+    for u, ref in [ (a*b, ua*ub), (a/b, ua/ub), (a+b, ua+ub), (a-b, ua-ub) ]:
+      # total error of independent stat./syst. propagated separately
+      self.assertAlmostEqual(u.nominal_value, ref.nominal_value)
+      self.assertAlmostEqual(u.std_dev, ref.std_dev)
+
+class TestIntegralIndex(unittest.TestCase):
+  def setUp(self):
+    self.rs = np.random.RandomState(42)
+    self.spectrum = randomSpectrum(self.rs, 200)
+    self.edges = utils.getEdges(self.spectrum)
+    self.uarr = getUArray(self.spectrum)
+
+  def assertBruteForce(self, index, e0, e1, rtol = 1e-9):
+    sums = index.sums(e0, e1)
+    for i in xrange(len(e0)):
+      ref = bruteForceSum(self.edges, self.uarr, e0[i], e1[i])
+      for k, v in zip(['nominal', 'stat', 'syst'], ref):
+        self.assertAlmostEqual(
+          getattr(sums, k)[i], v, delta = rtol * max(1., abs(v)),
+          msg = '%s [%g, %g]: %r != %r' % (
+            k, e0[i], e1[i], getattr(sums, k)[i], v
+          )
+        )
+
+  def test_sums_vs_brute_force(self):
+    index = IntegralIndex(self.edges, self.uarr)
+    # ranges w/ at least one bin edge inside, non-coinciding edges
+    e0 = self.rs.uniform(0., self.edges[-1], 500)
+    e1 = np.minimum(
+      e0 + self.rs.uniform(0.06, 2., 500), self.edges[-1] - 1e-3
+    )
+    self.assertBruteForce(index, e0, e1)
+
+  def test_coinciding_edges(self):
+    index = IntegralIndex(self.edges, self.uarr)
+    i0 = self.rs.randint(0, 100, 50)
+    i1 = i0 + self.rs.randint(1, 100, 50)
+    self.assertBruteForce(index, self.edges[i0], self.edges[i1])
+    # edges off by less than the coincidence tolerance count as coinciding
+    # (brute force includes slivers of the neighbouring bins)
+    jitter = 0.1 * utils.edge_tolerance
+    self.assertBruteForce(
+      index, self.edges[i0] + jitter, self.edges[i1] - jitter, rtol = 1e-6
+    )
+
+  def test_range_up_to_last_edge(self):
+    # NOTE: legacy getCocktailSum behaviour, last bin excluded at last edge
+    index = IntegralIndex(self.edges, self.uarr)
+    s = index.sums([self.edges[-3]], [self.edges[-1]])
+    self.assertAlmostEqual(s.nominal[0], self.uarr.nominal[-2])
+
+  def test_range_within_single_bin(self):
+    # NOTE: legacy getCocktailSum behaviour, uses the bin above the range
+    index = IntegralIndex(self.edges, self.uarr)
+    i = 10
+    e0, e1 = self.edges[i] + 0.25*(self.edges[i+1] - self.edges[i]), \
+            self.edges[i] + 0.5*(self.edges[i+1] - self.edges[i])
+    s = index.sums([e0], [e1])
+    frac = (e1 - e0) / (self.edges[i+2] - self.edges[i+1])
+    self.assertAlmostEqual(s.nominal[0], frac * self.uarr.nominal[i+1])
+    self.assertAlmostEqual(s.stat[0], frac * self.uarr.stat[i+1])
+
+  def test_memoized_sums_read_only(self):
+    index = IntegralIndex(self.edges, self.uarr)
+    s1 = index.sums([0.1, 0.2], [0.5, 0.7])
+    s2 = index.sums([0.1, 0.2], [0.5, 0.7])
+    np.testing.assert_array_equal(s1.nominal, s2.nominal)
+    self.assertEqual(len(index._sums), 1)
+    self.assertRaises(ValueError, s1.nominal.__setitem__, 0, 1.)
+
+  def test_scan(self):
+    low, upp = np.linspace(0.1, 0.5, 7), np.linspace(0.3, 1.2, 9)
+    scan = getMassRangesScan(self.spectrum, low, upp)
+    self.assertEqual(scan.nominal.shape, (7, 9))
+    for i, e0 in enumerate(low):
+      for j, e1 in enumerate(upp):
+        if e0 >= e1:
+          self.assertTrue(np.isnan(scan.nominal[i,j]))
+          continue
+        nominal = bruteForceSum(self.edges, self.uarr, e0, e1)[0]
+        self.assertAlmostEqual(scan.nominal[i,j], nominal)
+
+  def test_cache_and_persistence(self):
+    utils.clearIntegralIndexCache()
+    index = getIntegralIndex(self.spectrum)
+    self.assertTrue(getIntegralIndex(self.spectrum.copy()) is index)
+    tmpDir = tempfile.mkdtemp()
+    try:
+      file_url = os.path.join(tmpDir, 'index.npz')
+      index.save(file_url)
+      loaded = loadIntegralIndex(file_url)
+    finally: shutil.rmtree(tmpDir)
+    self.assertTrue(isinstance(loaded.edges, Edges))
+    e0, e1 = [0.05, 0.3], [0.9, 1.1]
+    np.testing.assert_allclose(
+      loaded.sums(e0, e1).nominal, index.sums(e0, e1).nominal
+    )
+
+class TestLoadDatFile(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.npyCacheDir, utils.npyCacheDir = utils.npyCacheDir, \
+        os.path.join(self.tmpDir, 'npycache')
+    self.file_url = os.path.join(self.tmpDir, 'data19.dat')
+
+  def tearDown(self):
+    utils.npyCacheDir = self.npyCacheDir
+    shutil.rmtree(self.tmpDir)
+
+  def test_sidecar_per_input(self):
+    for nrows in [3, 4, 5]: # new size: new key even w/ coarse mtimes
+      np.savetxt(self.file_url, np.arange(2.*nrows).reshape(nrows, 2))
+      for i in xrange(2): # 2nd call from sidecar
+        np.testing.assert_array_equal(
+          utils.loadDatFile(self.file_url), np.arange(2.*nrows).reshape(nrows, 2)
+        )
+      self.assertEqual(len(os.listdir(utils.npyCacheDir)), 1)
+    # same basename in other dir & other kwargs get their own sidecars
+    otherDir = os.path.join(self.tmpDir, 'other')
+    os.mkdir(otherDir)
+    shutil.copy(self.file_url, otherDir)
+    utils.loadDatFile(os.path.join(otherDir, 'data19.dat'))
+    utils.loadDatFile(self.file_url, usecols = (0,))
+    self.assertEqual(len(os.listdir(utils.npyCacheDir)), 3)
+
+class TestVersionInput(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.npyCacheDir, utils.npyCacheDir = utils.npyCacheDir, \
+        os.path.join(self.tmpDir, 'npycache')
+    self.inDir = os.path.join(self.tmpDir, 'Test')
+    os.makedirs(os.path.join(self.inDir, 'cocktail_contribs'))
+    os.mkdir(os.path.join(self.inDir, 'empty'))
+    for fn in ['data19.dat', 'cocktail19.dat', 'cocktail_contribs/eta19.dat']:
+      np.savetxt(os.path.join(self.inDir, fn), np.ones((3, 5)))
+    utils.buildVersionBundle(self.inDir)
+
+  def tearDown(self):
+    utils.npyCacheDir = self.npyCacheDir
+    shutil.rmtree(self.tmpDir)
+
+  def test_bundle_matches_dir(self):
+    vin = utils.VersionInput(self.inDir)
+    self.assertTrue(vin.bundle is not None)
+    self.assertEqual(sorted(vin.subdirs()), ['cocktail_contribs', 'empty'])
+    self.assertEqual(vin.entries('empty'), [])
+    self.assertEqual(
+      sorted(vin.entries()),
+      [('cocktail19.dat', '19', 'cocktail'), ('data19.dat', '19', 'data')]
+    )
+    np.testing.assert_array_equal(vin.load('data19.dat'), np.ones((3, 5)))
+
+  def test_outdated_bundle(self):
+    # edited (new size) & added files: directory read instead of bundle
+    for fn in ['data19.dat', 'data200.dat']:
+      np.savetxt(os.path.join(self.inDir, fn), 2.*np.ones((4, 5)))
+      vin = utils.VersionInput(self.inDir)
+      self.assertTrue(vin.bundle is None)
+      np.testing.assert_array_equal(vin.load(fn), 2.*np.ones((4, 5)))
+
+  def test_bundle_only(self):
+    shutil.rmtree(self.inDir)
+    vin = utils.VersionInput(self.inDir)
+    self.assertTrue(vin.bundle is not None)
+    np.testing.assert_array_equal(
+      vin.load('eta19.dat', 'cocktail_contribs'), np.ones((3, 5))
+    )
+
+if __name__ == '__main__':
+  unittest.main()